@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        # Ключ, по которому уже ждёт новая задача, повторять не нужно
+        waiting = Job.objects.filter(
+            status__in=Job.PENDING, key__isnull=False).values('key')
+        queryset.filter(status=Job.FAILED).exclude(key__in=waiting).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now())
+    retry.short_description = 'Повторить упавшие задачи'
+
+
+admin.site.register(Job, JobAdmin)
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Замеры для заголовка Server-Timing
+        from . import db, slow_queries, timing
+        timing.install()
+        # Прагмы SQLite для каждого нового соединения
+        connection_created.connect(db.configure_connection)
+        # Журнал медленных запросов на каждом новом соединении с базой
+        connection_created.connect(slow_queries.install)
@@ -0,0 +1,222 @@
+import logging
+import math
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.template.backends.django import Template
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Пространства имён, страницы которых измеряются
+NAMESPACES = ('posts', 'users', 'about')
+# Страницы, которым нужны параметры запроса
+QUERY_PARAMS = {
+    'posts:search': {'q': 'кофе'},
+}
+# Страницы, после которых пользователь разлогинен: только для гостя
+GUEST_ONLY = ('users:logout',)
+# Метрики, по которым сравниваются результаты
+TIME_METRICS = ('p50_ms', 'p95_ms', 'sql_ms', 'render_ms')
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@contextmanager
+def render_timer():
+    """Считает время отрисовки шаблонов, вызванных из представлений.
+
+    Оборачивается только render() шаблона бэкенда, поэтому вложенные
+    include не учитываются дважды.
+    """
+    original = Template.render
+    elapsed = [0.0]
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            elapsed[0] += time.perf_counter() - started
+
+    Template.render = render
+    try:
+        yield elapsed
+    finally:
+        Template.render = original
+
+
+@contextmanager
+def sql_timer():
+    """Считает число и суммарное время SQL-запросов."""
+    stats = {'queries': 0, 'time': 0.0}
+
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats['queries'] += 1
+            stats['time'] += time.perf_counter() - started
+
+    with connection.execute_wrapper(wrapper):
+        yield stats
+
+
+def iter_patterns(patterns, namespace=None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(
+                pattern.url_patterns, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield namespace, pattern
+
+
+def sample_kwargs():
+    """Самые «тяжёлые» объекты базы как параметры адресов."""
+    from posts.models import Comment, Group, Post
+
+    author = (
+        User.objects.annotate(posts_total=Count('posts'))
+        .order_by('-posts_total').first()
+    )
+    group = (
+        Group.objects.annotate(posts_total=Count('posts'))
+        .order_by('-posts_total').first()
+    )
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    kwargs = {}
+    if author is not None:
+        kwargs['username'] = author.username
+    if group is not None:
+        kwargs['slug'] = group.slug
+    if post is not None:
+        kwargs['post_id'] = post.pk
+        # Самая длинная ветка комментариев этого поста
+        thread = (
+            Comment.objects.filter(post=post)
+            .values('thread').annotate(total=Count('pk'))
+            .order_by('-total', 'thread').first()
+        )
+        if thread is not None:
+            kwargs['comment_id'] = thread['thread']
+    return kwargs
+
+
+def reader():
+    """Пользователь с самой большой лентой подписок."""
+    return (
+        User.objects.annotate(following_total=Count('follower'))
+        .order_by('-following_total', 'pk').first()
+    )
+
+
+def collect_urls(kwargs):
+    """Адреса всех именованных страниц из NAMESPACES."""
+    urls = {}
+    for namespace, pattern in iter_patterns(get_resolver().url_patterns):
+        if namespace not in NAMESPACES:
+            continue
+        name = f'{namespace}:{pattern.name}'
+        params = pattern.pattern.regex.groupindex
+        missing = [param for param in params if param not in kwargs]
+        if missing:
+            logger.warning(
+                'Страница %s пропущена: в базе нет объекта для %s',
+                name, ', '.join(missing))
+            continue
+        urls[name] = reverse(
+            name, kwargs={param: kwargs[param] for param in params})
+    return urls
+
+
+def measure(client, url, data, iterations, warmup):
+    durations = []
+    queries = sql_time = render_time = 0.0
+    status = None
+    for i in range(warmup + iterations):
+        with sql_timer() as sql, render_timer() as rendered:
+            started = time.perf_counter()
+            response = client.get(url, data)
+            duration = time.perf_counter() - started
+        if i < warmup:
+            continue
+        status = response.status_code
+        durations.append(duration)
+        queries += sql['queries']
+        sql_time += sql['time']
+        render_time += rendered[0]
+    return {
+        'status': status,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 95) * 1000, 3),
+        'mean_ms': round(statistics.mean(durations) * 1000, 3),
+        'queries': round(queries / iterations, 2),
+        'sql_ms': round(sql_time / iterations * 1000, 3),
+        'render_ms': round(render_time / iterations * 1000, 3),
+    }
+
+
+# Панель отладки не показывается: она меняет и время, и запросы
+@override_settings(ALLOWED_HOSTS=['*'], INTERNAL_IPS=[])
+def run(iterations=20, warmup=2, names=None):
+    """Прогоняет страницы через тестовый клиент гостем и пользователем.
+
+    Всё выполняется в транзакции, которая откатывается: страницы вроде
+    подписки на автора не меняют измеряемые данные.
+    """
+    results = {}
+    with transaction.atomic():
+        kwargs = sample_kwargs()
+        user = reader()
+        clients = {'guest': Client()}
+        if user is not None:
+            clients['user'] = Client()
+            clients['user'].force_login(user)
+        for name, url in sorted(collect_urls(kwargs).items()):
+            if names and name not in names:
+                continue
+            for audience, client in clients.items():
+                if audience != 'guest' and name in GUEST_ONLY:
+                    continue
+                results[f'{name} [{audience}]'] = dict(
+                    measure(client, url, QUERY_PARAMS.get(name),
+                            iterations, warmup),
+                    url=url
+                )
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """Регрессии current относительно baseline.
+
+    Время считается регрессией, если выросло больше чем на threshold
+    и больше чем на min_delta_ms; число запросов - при любом росте.
+    """
+    regressions = []
+    for key, before in baseline.items():
+        after = current.get(key)
+        if after is None:
+            continue
+        if after['queries'] > before['queries']:
+            regressions.append(
+                (key, 'queries', before['queries'], after['queries']))
+        for metric in TIME_METRICS:
+            delta = after[metric] - before[metric]
+            if (delta > min_delta_ms
+                    and delta > before[metric] * threshold):
+                regressions.append(
+                    (key, metric, before[metric], after[metric]))
+    return regressions
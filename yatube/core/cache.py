@@ -0,0 +1,274 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS invalidations ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' key TEXT, created REAL NOT NULL)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite, общий для всех процессов сервера.
+
+    Работает без отдельного сервера: процессы читают и пишут один файл
+    в режиме WAL. При переполнении MAX_ENTRIES удаляются записи, которые
+    дольше всех не читали (LRU).
+
+    Каждый процесс держит перед файлом небольшой локальный кеш
+    (LOCAL_TIMEOUT, LOCAL_MAX_ENTRIES). Запись и удаление ключа
+    попадают в таблицу invalidations, которую остальные процессы
+    просматривают не реже раза в POLL_INTERVAL секунд и выбрасывают
+    изменившиеся ключи из своих локальных копий.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 0)
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._poll_interval = options.get('POLL_INTERVAL', 1)
+        # Как часто (в операциях записи) проверять размер кеша
+        self._cull_interval = options.get('CULL_INTERVAL', 100)
+        # Время доступа обновляется не чаще, чем раз в столько секунд,
+        # чтобы чтение не превращалось в запись
+        self._access_resolution = options.get('ACCESS_RESOLUTION', 60)
+        # Сколько секунд хранится история инвалидаций
+        self._invalidation_ttl = options.get('INVALIDATION_TTL', 300)
+        self._thread = threading.local()
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._last_seen = None
+        self._last_poll = 0
+        self._writes = 0
+
+    # Соединения
+
+    def _connection(self):
+        # Соединение своё у каждого потока и не переживает fork()
+        pid = os.getpid()
+        if getattr(self._thread, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self._path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._thread.connection = connection
+            self._thread.pid = pid
+        return self._thread.connection
+
+    # Локальный кеш процесса и шина инвалидаций
+
+    def _poll_invalidations(self):
+        if not self._local_timeout:
+            return
+        now = time.time()
+        if now - self._last_poll < self._poll_interval:
+            return
+        self._last_poll = now
+        connection = self._connection()
+        oldest, newest = connection.execute(
+            'SELECT MIN(id), MAX(id) FROM invalidations').fetchone()
+        with self._lock:
+            if self._last_seen is None or (
+                    oldest is not None and oldest > self._last_seen + 1):
+                # Первый опрос или часть истории уже удалена:
+                # локальным копиям доверять нельзя
+                self._local.clear()
+            elif newest is not None and newest > self._last_seen:
+                rows = connection.execute(
+                    'SELECT key FROM invalidations WHERE id > ?',
+                    (self._last_seen,))
+                for (key,) in rows:
+                    if key is None:
+                        self._local.clear()
+                        break
+                    self._local.pop(key, None)
+            self._last_seen = newest or 0
+
+    def _get_local(self, key):
+        if not self._local_timeout:
+            return None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _set_local(self, key, value, expires):
+        if not self._local_timeout:
+            return
+        local_expires = time.time() + self._local_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        with self._lock:
+            self._local[key] = (value, local_expires)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _invalidate(self, connection, key):
+        # key=None означает очистку всего кеша
+        connection.execute(
+            'INSERT INTO invalidations (key, created) VALUES (?, ?)',
+            (key, time.time()))
+        with self._lock:
+            if key is None:
+                self._local.clear()
+            else:
+                self._local.pop(key, None)
+
+    # Операции кеша
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._poll_invalidations()
+        entry = self._get_local(key)
+        if entry is not None:
+            return entry[0]
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires < now:
+            return default
+        if now - accessed > self._access_resolution:
+            self._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        value = pickle.loads(value)
+        self._set_local(key, value, expires)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write(key, value, timeout, replace=False)
+
+    def _write(self, key, value, timeout, replace):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        connection = self._connection()
+        with _Transaction(connection):
+            if not replace:
+                row = connection.execute(
+                    'SELECT expires FROM cache WHERE key = ?',
+                    (key,)).fetchone()
+                if row is not None and (row[0] is None or row[0] > now):
+                    return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)', (key, data, expires, now))
+            self._invalidate(connection, key)
+        self._maybe_cull(connection)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        with _Transaction(connection):
+            updated = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?',
+                (self.get_backend_timeout(timeout), key)).rowcount
+            self._invalidate(connection, key)
+        return bool(updated)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        with _Transaction(connection):
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self._invalidate(connection, key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        # Чтение и запись в одной транзакции: инкремент атомарен
+        # для всех процессов
+        with _Transaction(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key))
+            self._invalidate(connection, key)
+        return value
+
+    def clear(self):
+        connection = self._connection()
+        with _Transaction(connection):
+            connection.execute('DELETE FROM cache')
+            self._invalidate(connection, None)
+
+    def _maybe_cull(self, connection):
+        self._writes += 1
+        if self._writes % self._cull_interval:
+            return
+        now = time.time()
+        with _Transaction(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE expires < ?', (now,))
+            connection.execute(
+                'DELETE FROM invalidations WHERE created < ?',
+                (now - self._invalidation_ttl,))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries and not self._cull_frequency:
+                # Как и в бэкендах Django, CULL_FREQUENCY = 0 очищает всё
+                connection.execute('DELETE FROM cache')
+            elif count > self._max_entries:
+                # Удаляем давно не читанные записи с запасом,
+                # чтобы не чистить кеш при каждой записи
+                excess = (count - self._max_entries
+                          + self._max_entries // self._cull_frequency)
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (excess,))
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: запись сразу берёт блокировку файла."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
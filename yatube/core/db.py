@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+# Время в сессии, до которого её чтения идут в основную базу
+PIN_SESSION_KEY = '_db_primary_until'
+
+_state = threading.local()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Настраивает новое соединение с SQLite прагмами SQLITE_PRAGMAS.
+
+    Реплика дополнительно получает query_only, а режим журнала на ней
+    не меняется: это запись в файл базы.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    replica = connection.alias == settings.DATABASE_REPLICA_ALIAS
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            if replica and pragma == 'journal_mode':
+                continue
+            try:
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+            except OperationalError:
+                # Например, WAL недоступен для базы в памяти
+                continue
+        if replica:
+            cursor.execute('PRAGMA query_only = ON')
+
+
+def replica_reads_enabled():
+    return getattr(_state, 'replica', False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Разрешает (или запрещает) читать из реплики внутри блока."""
+    previous = replica_reads_enabled()
+    _state.replica = enabled
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def primary_after_change(*changed_at):
+    """Блок читает из основной базы, если данные менялись недавно.
+
+    changed_at - время последних изменений (версии кешей). Пока реплика
+    может их не содержать, прочитанное из неё попало бы в общий кеш
+    под новой версией и жило бы там весь таймаут - и закрепление
+    сессии автора за основной базой от этого не спасает.
+    """
+    if time.time() - max(changed_at) < settings.DATABASE_REPLICA_PIN_SECONDS:
+        return replica_reads(False)
+    return nullcontext()
+
+
+def is_pinned(request):
+    """Сессия недавно писала в базу и читает из основной."""
+    return request.session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def pin_to_primary(request):
+    request.session[PIN_SESSION_KEY] = (
+        time.time() + settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def read_your_writes(view):
+    """Представление, после которого автор должен видеть свои изменения.
+
+    Само представление читает из основной базы, а после успешного ответа
+    сессия на DATABASE_REPLICA_PIN_SECONDS секунд закрепляется за ней:
+    за это время реплика успевает догнать основную базу.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(False):
+            response = view(request, *args, **kwargs)
+        if response.status_code < 400:
+            pin_to_primary(request)
+        return response
+    return wrapper
+
+
+def replicate(source, target):
+    """Копирует файл базы source в реплику target через backup API.
+
+    Используется для проверки реплики на одной машине: запуская копию
+    раз в несколько секунд, получаем задержку репликации.
+    """
+    primary = sqlite3.connect(source)
+    replica = sqlite3.connect(target, timeout=20)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+
+
+class ReplicaRouter:
+    """Чтение моделей DATABASE_REPLICA_APPS в GET-запросах идёт в реплику.
+
+    Внутри транзакции на основной базе чтение остаётся на ней, чтобы
+    видеть собственные незафиксированные изменения; запись всегда идёт
+    в основную базу. Без отдельного файла реплики DATABASE_REPLICA_ALIAS
+    открывает основной файл только для чтения: в WAL читатели не ждут
+    писателей.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = settings.DATABASE_REPLICA_ALIAS
+        if (not alias or not replica_reads_enabled()
+                or model._meta.app_label not in settings.DATABASE_REPLICA_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block
+                or self.is_mirror(alias)):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    @staticmethod
+    def is_mirror(alias):
+        # В тестах соединение подменяется копией основной базы
+        # (TEST MIRROR): тогда читать из неё нет смысла
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        return connections[alias].settings_dict['NAME'] == primary
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В реплике те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != settings.DATABASE_REPLICA_ALIAS
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+Task = namedtuple('Task', ('name', 'function', 'max_attempts'))
+
+TASKS = {}
+
+
+def task(name, max_attempts=None):
+    """Регистрирует функцию как задачу очереди под именем name.
+
+    Задачи описываются в модулях tasks.py приложений. Аргументы задачи
+    передаются через JSON, поэтому это должны быть простые значения.
+    Задача может выполниться повторно, и повтор не должен ничего
+    портить.
+    """
+    def decorator(function):
+        TASKS[name] = Task(name, function, max_attempts)
+        return function
+    return decorator
+
+
+def get_task(name):
+    if name not in TASKS:
+        autodiscover_modules('tasks')
+    return TASKS[name]
+
+
+def enqueue(name, kwargs=None, key=None, delay=0):
+    """Ставит задачу name с аргументами kwargs в очередь.
+
+    Задача записывается в текущей транзакции и видна воркерам только
+    после её фиксации. Пока задача с ключом key ждёт или выполняется,
+    повторная постановка возвращает её же. С JOBS_EAGER задача
+    выполняется сразу, без очереди.
+    """
+    task = get_task(name)
+    kwargs = kwargs or {}
+    if settings.JOBS_EAGER:
+        task.function(**kwargs)
+        return None
+    job = Job(
+        name=name,
+        payload=json.dumps(kwargs, cls=DjangoJSONEncoder),
+        key=key,
+        max_attempts=task.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if key is None:
+            raise
+        return Job.objects.filter(key=key, status__in=Job.PENDING).first()
+    return job
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: удваивается с каждой неудачей."""
+    return min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_DELAY
+    )
+
+
+def claim(worker):
+    """Берёт в работу одну готовую задачу или возвращает None.
+
+    Задача, которую воркер держит дольше JOBS_LOCK_TIMEOUT, считается
+    брошенной (процесс упал) и выдаётся снова. Брошенная задача, у
+    которой попытки кончились, помечается упавшей: иначе задача,
+    убивающая процесс воркера, перезапускалась бы бесконечно.
+    """
+    now = timezone.now()
+    stale = Q(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    )
+    Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        locked_at=None,
+        last_error='Воркер не завершил задачу за JOBS_LOCK_TIMEOUT',
+    )
+    ready = (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | stale & Q(attempts__lt=F('max_attempts'))
+    )
+    while True:
+        candidate = (
+            Job.objects.filter(ready).order_by('run_at', 'pk')
+            .values('pk', 'status').first()
+        )
+        if candidate is None:
+            return None
+        # Условное обновление: если задачу успел взять другой воркер,
+        # строк не обновится и ищем следующую
+        claimed = Job.objects.filter(ready, **candidate).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            locked_by=worker,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate['pk'])
+
+
+def execute(job):
+    """Выполняет взятую задачу: удаляет её или откладывает повтор."""
+    try:
+        task = get_task(job.name)
+        task.function(**json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error('Задача %s упала окончательно:\n%s', job, error)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, locked_at=None)
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning(
+                'Задача %s упала, повтор через %s с', job, delay)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED,
+                last_error=error,
+                locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(stop=None, once=False):
+    """Цикл воркера: выполняет задачи, пока не выставлен stop.
+
+    С once воркер выходит, когда готовых задач не осталось.
+    Возвращает число выполненных задач.
+    """
+    worker = worker_name()
+    done = 0
+    while stop is None or not stop.is_set():
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            if stop is None:
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+            else:
+                stop.wait(settings.JOBS_POLL_INTERVAL)
+            continue
+        done += execute(job)
+    return done
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bench
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает результаты bench_views с базовыми и завершается '
+            'с ошибкой при регрессиях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='JSON с базовыми результатами')
+        parser.add_argument('current', help='JSON с новыми результатами')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый относительный рост времени (0.2 = 20%%)')
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help='Рост времени меньше этого не считается регрессией')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['baseline'])
+        current = self.load(options['current'])
+        regressions = bench.compare(
+            baseline, current,
+            threshold=options['threshold'],
+            min_delta_ms=options['min_delta_ms']
+        )
+        for key, metric, before, after in regressions:
+            self.stdout.write(f'{key}: {metric} {before} -> {after}')
+        if regressions:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+        self.stdout.write('Регрессий нет')
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)['results']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
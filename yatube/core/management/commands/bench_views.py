@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import bench
+from posts.models import Comment, Follow, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время ответа, число и время SQL-запросов и время '
+            'отрисовки шаблонов для всех страниц на текущей базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Измерять только эту страницу (например, posts:index)')
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        results = bench.run(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            names=options['views']
+        )
+        self.stdout.write(
+            f'{"страница":<40} {"p50":>8} {"p95":>8} '
+            f'{"запросы":>8} {"sql":>8} {"шаблон":>8}'
+        )
+        for key, result in results.items():
+            self.stdout.write(
+                f'{key:<40} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f}'
+                f' {result["queries"]:>8.1f} {result["sql_ms"]:>8.2f}'
+                f' {result["render_ms"]:>8.2f}'
+            )
+        if options['output']:
+            report = {
+                'meta': {
+                    'created': timezone.now().isoformat(),
+                    'iterations': options['iterations'],
+                    # Размер данных, на которых получены цифры
+                    'dataset': {
+                        'users': User.objects.count(),
+                        'posts': Post.objects.count(),
+                        'comments': Comment.objects.count(),
+                        'follows': Follow.objects.count(),
+                    },
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
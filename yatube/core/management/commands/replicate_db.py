@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import replicate
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу в файл реплики DATABASE_REPLICA_PATH '
+            'раз в --lag секунд: так на одной машине получается реплика '
+            'с задержкой')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag', type=float, default=2.0,
+            help='Задержка репликации, секунды')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Скопировать один раз и выйти')
+
+    def handle(self, *args, **options):
+        source = settings.DATABASE_PATH
+        target = settings.DATABASE_REPLICA_PATH
+        if source == target:
+            raise CommandError(
+                'Реплика совпадает с основной базой: задайте '
+                'DATABASE_REPLICA_PATH')
+        while True:
+            replicate(source, target)
+            if options['once']:
+                break
+            time.sleep(options['lag'])
@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+def run_worker(once):
+    """Процесс воркера: по SIGTERM дорабатывает текущую задачу и выходит."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    jobs.work(stop, once=once)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновой очереди задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOBS_WORKERS,
+            help='Число процессов-воркеров')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            done = jobs.work(once=options['once'])
+            self.stdout.write(f'Задач выполнено: {done}')
+            return
+        # Процессы создаются через fork: открытые соединения с базой
+        # не должны достаться дочерним процессам
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=run_worker, args=(options['once'],))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        # Остановка родителя передаётся воркерам
+        signal.signal(
+            signal.SIGTERM,
+            lambda *args: [worker.terminate() for worker in workers]
+        )
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,75 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import query_shape, read_log
+
+SORT_KEYS = {
+    'total': lambda shape: shape['total_ms'],
+    'mean': lambda shape: shape['total_ms'] / shape['count'],
+    'max': lambda shape: shape['max_ms'],
+    'count': lambda shape: shape['count'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Группирует журнал медленных запросов по форме запроса '
+            'и выводит самые тяжёлые')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Путь к журналу (ротированные копии читаются тоже)')
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Только запросы этих представлений; «admin:» - '
+                 'все страницы админки')
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='total')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        shapes = {}
+        for record in read_log(options['log']):
+            view = record.get('view') or '-'
+            if options['views'] and not any(
+                    view.startswith(prefix) for prefix in options['views']):
+                continue
+            shape = query_shape(record['sql'])
+            entry = shapes.setdefault(shape, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'views': Counter(), 'templates': Counter(), 'slowest': None,
+            })
+            entry['count'] += 1
+            entry['total_ms'] += record['duration_ms']
+            entry['views'][view] += 1
+            if record.get('template'):
+                entry['templates'][record['template']] += 1
+            if record['duration_ms'] >= entry['max_ms']:
+                entry['max_ms'] = record['duration_ms']
+                entry['slowest'] = record
+
+        ranked = sorted(
+            shapes.items(), key=lambda item: SORT_KEYS[options['sort']](
+                item[1]), reverse=True)
+        for shape, entry in ranked[:options['limit']]:
+            slowest = entry['slowest']
+            self.stdout.write(
+                f'{entry["count"]} раз, всего {entry["total_ms"]:.0f} мс, '
+                f'в среднем {entry["total_ms"] / entry["count"]:.1f} мс, '
+                f'максимум {entry["max_ms"]:.1f} мс'
+            )
+            self.stdout.write(f'  {shape}')
+            self.stdout.write('  Представления: ' + ', '.join(
+                f'{view} ({count})'
+                for view, count in entry['views'].most_common(5)))
+            if entry['templates']:
+                self.stdout.write('  Шаблоны: ' + ', '.join(
+                    f'{line} ({count})'
+                    for line, count in entry['templates'].most_common(3)))
+            if slowest.get('source'):
+                self.stdout.write(f'  Источник: {slowest["source"]}')
+            for step in slowest.get('plan') or ():
+                self.stdout.write(f'    {step}')
+            self.stdout.write('')
@@ -0,0 +1,158 @@
+import bisect
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .timing import METRICS
+
+# Верхние границы корзин гистограммы времени ответа, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+WORKER_KEY = 'core:metrics:{pid}'
+# Слот процесса: pid, занятый через cache.add. Добавление атомарно,
+# поэтому процессы не затирают регистрации друг друга, как при
+# чтении и перезаписи общего списка
+SLOT_KEY = 'core:metrics:slot:{slot}'
+
+
+class Histograms:
+    """Гистограммы времени ответа по представлениям в одном процессе.
+
+    Накопленные значения раз в METRICS_FLUSH_INTERVAL секунд
+    копируются в общий кеш, откуда их собирает страница метрик.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._flushed = time.monotonic()
+        self._slot = None
+
+    def observe(self, view, duration, timings):
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = {
+                    'buckets': [0] * len(BUCKETS),
+                    'count': 0,
+                    'sum': 0.0,
+                    'queries': 0,
+                    'components': dict.fromkeys(METRICS, 0.0),
+                }
+            index = bisect.bisect_left(BUCKETS, duration)
+            if index < len(BUCKETS):
+                entry['buckets'][index] += 1
+            entry['count'] += 1
+            entry['sum'] += duration
+            entry['queries'] += timings.queries
+            for metric, value in timings.durations.items():
+                entry['components'][metric] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: dict(
+                    entry,
+                    buckets=list(entry['buckets']),
+                    components=dict(entry['components'])
+                )
+                for view, entry in self._views.items()
+            }
+
+    def maybe_flush(self):
+        if (time.monotonic() - self._flushed
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        self._flushed = time.monotonic()
+        pid = os.getpid()
+        cache.set(
+            WORKER_KEY.format(pid=pid), self.snapshot(),
+            settings.METRICS_TIMEOUT
+        )
+        self._register(pid)
+
+    def _register(self, pid):
+        # После fork() слот родителя хранит чужой pid, а слот процесса,
+        # долго не сбрасывавшего метрики, мог освободить collect()
+        if (self._slot is not None
+                and cache.get(SLOT_KEY.format(slot=self._slot)) == pid):
+            return
+        for slot in range(settings.METRICS_WORKER_SLOTS):
+            if cache.add(SLOT_KEY.format(slot=slot), pid, None):
+                self._slot = slot
+                return
+
+
+histograms = Histograms()
+
+
+def collect():
+    """Гистограммы всех процессов, сложенные по представлениям."""
+    histograms.flush()
+    slots = cache.get_many([
+        SLOT_KEY.format(slot=slot)
+        for slot in range(settings.METRICS_WORKER_SLOTS)
+    ])
+    snapshots = cache.get_many(
+        {WORKER_KEY.format(pid=pid) for pid in slots.values()})
+    for key, pid in slots.items():
+        if WORKER_KEY.format(pid=pid) not in snapshots:
+            # Процесс давно не сбрасывал метрики и, видимо, завершился
+            cache.delete(key)
+    merged = {}
+    for snapshot in snapshots.values():
+        for view, entry in snapshot.items():
+            total = merged.get(view)
+            if total is None:
+                merged[view] = dict(
+                    entry,
+                    buckets=list(entry['buckets']),
+                    components=dict(entry['components'])
+                )
+                continue
+            total['buckets'] = [
+                a + b for a, b in zip(total['buckets'], entry['buckets'])]
+            for key in ('count', 'sum', 'queries'):
+                total[key] += entry[key]
+            for metric, value in entry['components'].items():
+                total['components'][metric] += value
+    return merged
+
+
+def render_prometheus(views):
+    """Метрики в текстовом формате Prometheus."""
+    lines = [
+        '# TYPE yatube_request_duration_seconds histogram',
+    ]
+    for view, entry in sorted(views.items()):
+        label = f'view="{view}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, entry['buckets']):
+            cumulative += count
+            lines.append(
+                f'yatube_request_duration_seconds_bucket'
+                f'{{{label},le="{bound}"}} {cumulative}'
+            )
+        lines += [
+            f'yatube_request_duration_seconds_bucket'
+            f'{{{label},le="+Inf"}} {entry["count"]}',
+            f'yatube_request_duration_seconds_sum{{{label}}} {entry["sum"]}',
+            f'yatube_request_duration_seconds_count{{{label}}} '
+            f'{entry["count"]}',
+        ]
+    lines.append('# TYPE yatube_request_component_seconds counter')
+    for view, entry in sorted(views.items()):
+        for metric, value in entry['components'].items():
+            lines.append(
+                f'yatube_request_component_seconds'
+                f'{{view="{view}",component="{metric}"}} {value}'
+            )
+    lines.append('# TYPE yatube_request_queries counter')
+    for view, entry in sorted(views.items()):
+        lines.append(
+            f'yatube_request_queries{{view="{view}"}} {entry["queries"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,95 @@
+import cProfile
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db, timing
+from .metrics import histograms
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Замер времени запроса, который можно держать включённым всегда.
+
+    В заголовок Server-Timing выводится время работы с базой, шаблонами,
+    кешем и миниатюрами (время шаблонов включает вызванные из них кеш
+    и миниатюры); время ответа попадает в гистограммы страницы
+    метрик. Сотрудник может добавить к адресу ?profile=1, а доля
+    PROFILE_SAMPLE_RATE запросов профилируется сама: результат cProfile
+    записывается в PROFILE_DIR.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timings = timing.begin(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.end()
+        self.stop_profiler(request, response)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        histograms.observe(view, duration, timings)
+        response['Server-Timing'] = ', '.join(
+            [f'{metric};dur={value * 1000:.2f}'
+             for metric, value in timings.durations.items()]
+            + [f'total;dur={duration * 1000:.2f}']
+        )
+        histograms.maybe_flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Здесь пользователь уже известен, а представление ещё не вызвано
+        requested = 'profile' in request.GET and request.user.is_staff
+        if requested or random.random() < settings.PROFILE_SAMPLE_RATE:
+            request.profiler = cProfile.Profile()
+            try:
+                request.profiler.enable()
+            except ValueError:
+                # В потоке уже работает другой профилировщик
+                request.profiler = None
+
+    def stop_profiler(self, request, response):
+        profiler = getattr(request, 'profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        view = request.resolver_match.view_name.replace(':', '-')
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-{os.getpid()}.prof'
+        profiler.dump_stats(os.path.join(settings.PROFILE_DIR, name))
+        logger.info('Профиль %s записан в %s', request.path, name)
+        if request.user.is_staff:
+            response['X-Profile'] = name
+
+
+class ReplicaReadsMiddleware:
+    """GET и HEAD читают данные из реплики.
+
+    Сессия, которая недавно писала в базу (см. db.read_your_writes),
+    читает из основной базы, пока реплика её не догонит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or db.is_pinned(request):
+            return self.get_response(request)
+        with db.replica_reads():
+            return self.get_response(request)
@@ -0,0 +1,69 @@
+# core/models.py
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Задача фоновой очереди (см. core.jobs).
+
+    Выполненная задача удаляется; задача, исчерпавшая попытки,
+    остаётся со статусом failed и текстом ошибки.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+    PENDING = (QUEUED, RUNNING)
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.TextField(default='{}', verbose_name='Аргументы, JSON')
+    key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Попыток не больше')
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Выполнить не раньше')
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Взята в работу')
+    locked_by = models.CharField(
+        max_length=100, blank=True, verbose_name='Воркер')
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Создана')
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        # Воркер выбирает готовые задачи по статусу и времени запуска
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+        # Ключ повторяется только у выполненных или упавших задач:
+        # пока задача ждёт, вторую такую же поставить нельзя
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=('queued', 'running')),
+                name='job_pending_key_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
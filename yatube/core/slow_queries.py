@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+
+from . import timing
+
+logger = logging.getLogger('yatube.slow_queries')
+
+DJANGO_DIR = os.path.dirname(sys.modules['django'].__file__)
+TEMPLATE_BASE = os.path.join(DJANGO_DIR, 'template', 'base.py')
+# Обёртки замеров сами запросов не делают: в источнике их пропускаем
+INSTRUMENTATION_FILES = tuple(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('slow_queries.py', 'timing.py', 'middleware.py')
+)
+
+# Нормализация SQL к «форме» запроса для группировки в отчёте
+SHAPE_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def install(sender, connection, **kwargs):
+    """Подключает журнал медленных запросов к новому соединению."""
+    if settings.SLOW_QUERY_THRESHOLD_MS is None:
+        return
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            log_query(context['connection'], sql, params, many, duration)
+
+
+def log_query(connection, sql, params, many, duration):
+    record = {
+        'time': time.time(),
+        'duration_ms': round(duration, 3),
+        'database': connection.alias,
+        'sql': sql,
+        'params': None if many else _jsonable(params),
+        'view': current_view(),
+        'source': source_line(),
+        'template': template_line(),
+        'plan': None if many else explain(connection, sql, params),
+    }
+    logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+def _jsonable(params):
+    if params is None:
+        return None
+    return [
+        value if isinstance(value, (int, float, str, type(None)))
+        else str(value)
+        for value in params
+    ]
+
+
+def current_view():
+    timings = timing.current()
+    request = timings and timings.request
+    if request is None:
+        return None
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+def source_line():
+    """Последний вызов из кода проекта, который привёл к запросу."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(settings.BASE_DIR)
+                and filename not in INSTRUMENTATION_FILES):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def template_line():
+    """Строка шаблона, при отрисовке которой выполнен запрос."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if (frame.f_code.co_name == 'render_annotated'
+                and frame.f_code.co_filename == TEMPLATE_BASE):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """План запроса. Курсор берётся без обёрток, чтобы не зациклиться."""
+    prefix = ('EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+              else 'EXPLAIN')
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [' '.join(str(column) for column in row)
+                if connection.vendor != 'sqlite' else row[-1]
+                for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        cursor.close()
+
+
+def query_shape(sql):
+    """SQL без значений и с одинаковыми списками IN."""
+    for pattern, replacement in SHAPE_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def read_log(path):
+    """Записи журнала и его ротированных копий, от старых к новым."""
+    paths = [path]
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        paths.insert(0, f'{path}.{index}')
+        index += 1
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -1,7 +1,42 @@
 # core/tests
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post
+
+from . import bench, db, jobs, metrics, slow_queries, timing
+from .cache import SQLiteCache
+from .db import ReplicaRouter
+from .models import Job
+
+User = get_user_model()
+
+CALLS = []
+
+
+@jobs.task('core.tests.record')
+def record(value, fail=0):
+    """Тестовая задача: падает первые fail раз."""
+    CALLS.append(value)
+    if CALLS.count(value) <= fail:
+        raise ValueError(value)
 
 
 class ViewTestClass(TestCase):
@@ -10,3 +45,473 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('LOCAL_TIMEOUT', 60)
+        options.setdefault('POLL_INTERVAL', 0)
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_processes_share_values(self):
+        """Значение, записанное одним процессом, видно другому."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertTrue(second.add('other', 1))
+        self.assertFalse(first.add('other', 2))
+        self.assertEqual(first.incr('other'), 2)
+
+    def test_invalidation_reaches_local_copies(self):
+        """Изменение ключа сбрасывает локальные копии других процессов."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'old')
+        self.assertEqual(second.get('key'), 'old')
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        second.set('key', 'value')
+        first.clear()
+        self.assertIsNone(second.get('key'))
+
+    def test_expired_value_is_not_returned(self):
+        """Просроченное значение не возвращается."""
+        cache = self.make_cache()
+        cache.set('key', 'value', timeout=0)
+        self.assertIsNone(cache.get('key'))
+
+    def test_least_recently_used_entries_are_culled(self):
+        """При переполнении удаляются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=2, CULL_FREQUENCY=10, CULL_INTERVAL=1,
+            ACCESS_RESOLUTION=0, LOCAL_TIMEOUT=0
+        )
+        cache.set('old', 1)
+        cache.set('used', 2)
+        cache.get('used')
+        cache.set('new', 3)
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get('used'), 2)
+        self.assertEqual(cache.get('new'), 3)
+
+
+class BenchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='TestAuthor')
+        reader = User.objects.create_user(username='TestReader')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text='Тестовый текст', author=author)
+
+    def test_run_measures_pages(self):
+        """Замер собирает метрики для гостя и пользователя."""
+        results = bench.run(
+            iterations=2, warmup=0,
+            names=['posts:index', 'posts:profile', 'users:logout']
+        )
+        self.assertEqual(set(results), {
+            'posts:index [guest]', 'posts:index [user]',
+            'posts:profile [guest]', 'posts:profile [user]',
+            'users:logout [guest]',
+        })
+        result = results['posts:profile [user]']
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['render_ms'], 0)
+        self.assertEqual(result['url'], '/profile/TestAuthor/')
+
+    def test_thread_is_measured_or_reported(self):
+        """Ветка комментариев измеряется, если в базе есть комментарии,
+           иначе пропуск страницы попадает в лог."""
+        with self.assertLogs('core.bench', 'WARNING') as logs:
+            urls = bench.collect_urls(bench.sample_kwargs())
+        self.assertNotIn('posts:comment_thread', urls)
+        self.assertIn('posts:comment_thread', '\n'.join(logs.output))
+        post = Post.objects.get()
+        root = Comment.objects.create(
+            post=post, author=post.author, text='Корень')
+        Comment.objects.create(
+            post=post, author=post.author, text='Ответ', parent=root)
+        urls = bench.collect_urls(bench.sample_kwargs())
+        self.assertEqual(
+            urls['posts:comment_thread'],
+            reverse('posts:comment_thread',
+                    kwargs={'post_id': post.pk, 'comment_id': root.pk})
+        )
+
+    def test_run_leaves_data_unchanged(self):
+        """Страницы подписки не меняют данные после замера."""
+        follows = list(Follow.objects.values_list('user', 'author'))
+        bench.run(iterations=1, warmup=0, names=[
+            'posts:profile_follow', 'posts:profile_unfollow'])
+        self.assertEqual(
+            list(Follow.objects.values_list('user', 'author')), follows)
+
+    def test_compare_flags_regressions(self):
+        """Сравнение находит рост запросов и заметный рост времени."""
+        before = {'p50_ms': 10, 'p95_ms': 20, 'sql_ms': 1,
+                  'render_ms': 5, 'queries': 3}
+        after = dict(before, p50_ms=10.5, p95_ms=40, queries=4)
+        regressions = bench.compare({'page': before}, {'page': after})
+        self.assertEqual(
+            [(metric, old, new) for _, metric, old, new in regressions],
+            [('queries', 3, 4), ('p95_ms', 20, 40)]
+        )
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.staff = User.objects.create_user(
+            username='TestStaff', is_staff=True)
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = self.client_class()
+        self.staff_client.force_login(self.staff)
+
+    def test_server_timing_header(self):
+        """Ответ содержит разбивку времени в Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        metrics = [
+            part.split(';')[0]
+            for part in response['Server-Timing'].split(', ')
+        ]
+        self.assertEqual(
+            metrics, ['db', 'template', 'cache', 'thumbnail', 'total'])
+
+    def test_metrics_endpoint(self):
+        """Гистограммы доступны сотрудникам и по токену."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            self.client.get(reverse('metrics')).status_code,
+            HTTPStatus.FORBIDDEN
+        )
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="posts:index"}'
+        )
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_staff_can_capture_profile(self):
+        """Сотрудник получает профиль запроса по ?profile=1."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(PROFILE_DIR=directory):
+            self.client.get(reverse('posts:index') + '?profile=1')
+            self.assertEqual(os.listdir(directory), [])
+            response = self.staff_client.get(
+                reverse('posts:index') + '?profile=1')
+        self.assertEqual(os.listdir(directory), [response['X-Profile']])
+
+    def worker_flush(self, pid, worker):
+        with mock.patch('core.metrics.os.getpid', return_value=pid):
+            worker.flush()
+
+    def test_metrics_collect_every_worker(self):
+        """Каждый процесс занимает свой слот; слот завершившегося
+           процесса освобождается, а живой регистрируется снова."""
+        workers = {pid: metrics.Histograms() for pid in (1001, 1002)}
+        for pid, worker in workers.items():
+            worker.observe('core:worker', 0.01, timing.RequestTimings())
+            self.worker_flush(pid, worker)
+        self.assertEqual(
+            metrics.collect()['core:worker']['count'], len(workers))
+        self.assertNotEqual(workers[1001]._slot, workers[1002]._slot)
+
+        cache.delete(metrics.WORKER_KEY.format(pid=1001))
+        metrics.collect()
+        self.assertIsNone(cache.get(
+            metrics.SLOT_KEY.format(slot=workers[1001]._slot)))
+        self.worker_flush(1001, workers[1001])
+        self.assertEqual(
+            metrics.collect()['core:worker']['count'], len(workers))
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = self.client_class()
+        self.authorized_client.force_login(self.user)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_query_is_logged_with_context(self):
+        """Медленный запрос пишется с представлением, шаблоном и планом."""
+        with self.assertLogs('yatube.slow_queries') as logs:
+            self.authorized_client.get(
+                reverse('posts:profile', kwargs={'username': self.user}))
+        records = [json.loads(line.split(':', 2)[2]) for line in logs.output]
+        posts = [
+            record for record in records
+            if 'FROM "posts_post"' in record['sql']
+            and 'LIMIT' in record['sql']
+        ]
+        self.assertTrue(posts)
+        record = posts[0]
+        self.assertEqual(record['view'], 'posts:profile')
+        self.assertTrue(record['plan'])
+        self.assertTrue(record['source'])
+        self.assertTrue(
+            any(r['template'] for r in records),
+            'Хотя бы один запрос выполняется при отрисовке шаблона'
+        )
+
+    def test_fast_queries_are_not_logged(self):
+        """Быстрые запросы в журнал не попадают."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.slow_queries'):
+                Post.objects.count()
+
+    def test_query_shape(self):
+        """Форма запроса не зависит от значений и длины списков IN."""
+        self.assertEqual(
+            slow_queries.query_shape(
+                'SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 10'),
+            slow_queries.query_shape(
+                "SELECT *  FROM t WHERE id IN (%s) LIMIT 20"),
+        )
+
+    def test_report_groups_by_shape(self):
+        """Отчёт группирует записи и фильтрует по представлению."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'slow.log')
+        records = [
+            {'sql': 'SELECT a FROM t WHERE id = 1', 'duration_ms': 150,
+             'view': 'posts:profile', 'plan': ['SCAN t']},
+            {'sql': 'SELECT a FROM t WHERE id = 2', 'duration_ms': 250,
+             'view': 'posts:profile', 'plan': ['SCAN t']},
+            {'sql': 'SELECT b FROM u', 'duration_ms': 120,
+             'view': 'admin:posts_post_changelist', 'plan': []},
+        ]
+        with open(path + '.1', 'w', encoding='utf-8') as file:
+            file.write(json.dumps(records[0]) + '\n')
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records[1:]:
+                file.write(json.dumps(record) + '\n')
+        out = StringIO()
+        call_command('slow_queries_report', log=path, stdout=out)
+        report = out.getvalue()
+        self.assertIn('2 раз, всего 400 мс', report)
+        self.assertLess(report.index('FROM t'), report.index('FROM u'))
+        out = StringIO()
+        call_command(
+            'slow_queries_report', log=path, views=['admin:'], stdout=out)
+        self.assertNotIn('FROM t', out.getvalue())
+        self.assertIn('FROM u', out.getvalue())
+
+
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.authorized_client = self.client_class()
+        self.authorized_client.force_login(self.user)
+
+    def test_reads_outside_get_go_to_default(self):
+        """Без флага чтения идут в основную базу."""
+        with mock.patch.object(ReplicaRouter, 'is_mirror',
+                               return_value=False):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_get_reads_go_to_replica(self):
+        """В GET-запросе посты вне транзакции читаются из реплики."""
+        with mock.patch.object(ReplicaRouter, 'is_mirror',
+                               return_value=False):
+            with mock.patch.object(
+                    connections['default'], 'in_atomic_block', False):
+                with db.replica_reads():
+                    self.assertEqual(
+                        self.router.db_for_read(Post), 'replica')
+                    # Пользователи и сессии читаются из основной базы
+                    self.assertEqual(
+                        self.router.db_for_read(User), 'default')
+            with db.replica_reads():
+                # TestCase держит открытую транзакцию
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_recent_change_is_read_from_primary(self):
+        """Данные, изменённые позже возможной задержки реплики, читаются
+           из основной базы: иначе в кеш под новой версией попала бы
+           устаревшая копия."""
+        lag = settings.DATABASE_REPLICA_PIN_SECONDS
+        with mock.patch.object(ReplicaRouter, 'is_mirror',
+                               return_value=False):
+            with mock.patch.object(
+                    connections['default'], 'in_atomic_block', False):
+                with db.replica_reads():
+                    with db.primary_after_change(time.time() - 1):
+                        self.assertEqual(
+                            self.router.db_for_read(Post), 'default')
+                    with db.primary_after_change(time.time() - lag - 1):
+                        self.assertEqual(
+                            self.router.db_for_read(Post), 'replica')
+
+    def test_mirror_and_writes_use_default(self):
+        """Зеркало основной базы и запись не уходят в реплику."""
+        with db.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_session_is_pinned_after_write(self):
+        """После комментария сессия читает посты из основной базы."""
+        self.assertFalse(db.is_pinned(self.authorized_client))
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'}
+        )
+        self.assertTrue(db.is_pinned(self.authorized_client))
+        with mock.patch.object(
+                db, 'replica_reads', wraps=db.replica_reads) as reads:
+            # Вызовы replica_reads(False) только запрещают реплику
+            self.authorized_client.get(reverse('posts:index'))
+            self.assertNotIn(mock.call(), reads.call_args_list)
+            self.client.get(reverse('posts:index'))
+            self.assertEqual(reads.call_args_list.count(mock.call()), 1)
+
+    def test_pin_expires(self):
+        """Закрепление за основной базой длится ограниченное время."""
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=-1):
+            self.authorized_client.get(
+                reverse('posts:profile_follow',
+                        kwargs={'username': self.user}))
+        self.assertFalse(db.is_pinned(self.authorized_client))
+
+    def test_session_is_pinned_after_unfollow(self):
+        """После отписки профиль и лента читаются из основной базы."""
+        author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=self.user, author=author)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': author}))
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=author).exists())
+        self.assertTrue(db.is_pinned(self.authorized_client))
+
+    def test_replicate_copies_primary(self):
+        """Реплика отстаёт от основной базы до следующей копии."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(primary) as connection:
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('CREATE TABLE t (id INTEGER)')
+            connection.execute('INSERT INTO t VALUES (1)')
+        db.replicate(primary, replica)
+        with sqlite3.connect(primary) as connection:
+            connection.execute('INSERT INTO t VALUES (2)')
+        reader = sqlite3.connect(f'file:{replica}?mode=ro', uri=True)
+        self.addCleanup(reader.close)
+        count = 'SELECT COUNT(*) FROM t'
+        self.assertEqual(reader.execute(count).fetchone()[0], 1)
+        db.replicate(primary, replica)
+        self.assertEqual(reader.execute(count).fetchone()[0], 2)
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает прагмы из SQLITE_PRAGMAS."""
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA temp_store')
+            # 2 - MEMORY
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@override_settings(JOBS_RETRY_DELAY=10)
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_key_deduplicates_pending_jobs(self):
+        """Пока задача ждёт, задача с тем же ключом не ставится."""
+        first = jobs.enqueue('core.tests.record', {'value': 1}, key='one')
+        second = jobs.enqueue('core.tests.record', {'value': 2}, key='one')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(jobs.work(once=True), 1)
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+        jobs.enqueue('core.tests.record', {'value': 3}, key='one')
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой."""
+        job = jobs.enqueue('core.tests.record', {'value': 1, 'fail': 1})
+        started = timezone.now()
+        self.assertEqual(jobs.work(once=True), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('ValueError', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        self.assertEqual(jobs.retry_delay(3), 40)
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.work(once=True), 1)
+        self.assertEqual(CALLS, [1, 1])
+
+    @override_settings(JOBS_RETRY_DELAY=0)
+    def test_job_fails_after_max_attempts(self):
+        """После последней попытки задача остаётся с ошибкой."""
+        job = jobs.enqueue('core.tests.record', {'value': 1, 'fail': 10})
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, settings.JOBS_MAX_ATTEMPTS)
+
+    def test_abandoned_job_is_claimed_again(self):
+        """Задачу упавшего воркера забирает другой."""
+        jobs.enqueue('core.tests.record', {'value': 1})
+        self.assertIsNotNone(jobs.claim('dead'))
+        self.assertIsNone(jobs.claim('alive'))
+        Job.objects.update(
+            locked_at=timezone.now() - timedelta(
+                seconds=settings.JOBS_LOCK_TIMEOUT + 1))
+        job = jobs.claim('alive')
+        self.assertEqual(job.locked_by, 'alive')
+        self.assertEqual(job.attempts, 2)
+
+    def test_abandoned_job_without_attempts_left_fails(self):
+        """Задача, каждый раз убивающая воркер, не выдаётся бесконечно."""
+        jobs.enqueue('core.tests.record', {'value': 1})
+        Job.objects.update(max_attempts=1)
+        self.assertIsNotNone(jobs.claim('dead'))
+        Job.objects.update(
+            locked_at=timezone.now() - timedelta(
+                seconds=settings.JOBS_LOCK_TIMEOUT + 1))
+        self.assertIsNone(jobs.claim('alive'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.locked_at)
+
+    def test_run_workers_command(self):
+        """Команда выполняет готовые задачи."""
+        jobs.enqueue('core.tests.record', {'value': 1})
+        jobs.enqueue('core.tests.record', {'value': 2}, delay=60)
+        out = StringIO()
+        call_command('run_workers', processes=1, once=True, stdout=out)
+        self.assertEqual(CALLS, [1])
+        self.assertIn('Задач выполнено: 1', out.getvalue())
@@ -0,0 +1,111 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Составляющие времени запроса в заголовке Server-Timing
+METRICS = ('db', 'template', 'cache', 'thumbnail')
+# Методы бэкенда кеша, время которых учитывается
+CACHE_METHODS = (
+    'get', 'set', 'add', 'delete', 'touch', 'incr', 'decr', 'has_key',
+    'get_many', 'set_many', 'delete_many', 'get_or_set', 'clear',
+)
+
+_state = threading.local()
+
+
+class RequestTimings:
+    """Время, потраченное запросом на базу, шаблоны, кеш и миниатюры."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.durations = dict.fromkeys(METRICS, 0.0)
+        self.queries = 0
+        self._depth = dict.fromkeys(METRICS, 0)
+
+    def start(self, metric):
+        # Вложенные вызовы (get_many через get, include в шаблоне)
+        # учитываются один раз - во внешнем вызове
+        self._depth[metric] += 1
+        if self._depth[metric] == 1:
+            return time.perf_counter()
+        return None
+
+    def stop(self, metric, started):
+        self._depth[metric] -= 1
+        if started is not None:
+            self.durations[metric] += time.perf_counter() - started
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_state, 'timings', None)
+
+
+def begin(request=None):
+    timings = RequestTimings(request)
+    _state.timings = timings
+    return timings
+
+
+def end():
+    _state.timings = None
+
+
+class measure:
+    """Контекстный менеджер: учитывает время блока в метрике запроса."""
+
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.timings = current()
+        if self.timings is not None:
+            self.started = self.timings.start(self.metric)
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.stop(self.metric, self.started)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Обёртка запросов к базе: время и число запросов."""
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    with measure('db'):
+        return execute(sql, params, many, context)
+
+
+def timed(function, metric):
+    """Оборачивает функцию замером времени в метрике metric."""
+    if getattr(function, 'timing_metric', None):
+        return function
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with measure(metric):
+            return function(*args, **kwargs)
+
+    wrapper.timing_metric = metric
+    return wrapper
+
+
+def install():
+    """Подключает замеры к шаблонам и бэкендам кеша.
+
+    Вызывается один раз при запуске; вне запроса обёртки только
+    проверяют, что замер не идёт.
+    """
+    from django.template.backends.django import Template
+    Template.render = timed(Template.render, 'template')
+    for alias in settings.CACHES.values():
+        backend = import_string(alias['BACKEND'])
+        for name in CACHE_METHODS:
+            # Оборачиваем только собственные методы класса, чтобы
+            # не менять базовый класс, общий для всех бэкендов
+            if name in vars(backend):
+                setattr(backend, name, timed(vars(backend)[name], 'cache'))
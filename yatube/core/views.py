@@ -1,5 +1,11 @@
 # core/views.py
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import collect, render_prometheus
 
 
 def page_not_found(request, exception):
@@ -18,3 +24,21 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    """Гистограммы времени ответа всех процессов в формате Prometheus.
+
+    Доступны сотрудникам и сборщику метрик с токеном METRICS_TOKEN
+    в заголовке Authorization: Bearer.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (
+            token and constant_time_compare(
+                authorization, f'Bearer {token}')):
+        raise PermissionDenied
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,10 +1,80 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
 
+from .feed_cache import get_feed_version
+from .group_choices import group_labels
 # Из модуля models импортируем модель
 from .models import Comment, Follow, Group, Post
+from .pagination import EstimatedCountPaginator
+from .search import fts_query
+
+DATES_KEY = 'posts:admin_dates:{digest}'
+
+
+class CachedDatesQuerySet(QuerySet):
+    """QuerySet, который кеширует даты для иерархии дат админки.
+
+    Иерархия запрашивает DISTINCT по году (месяцу, дню) всех постов при
+    каждом открытии списка; результат не меняется, пока версия лент
+    та же.
+    """
+
+    def _cached(self, method, *args):
+        sql, params = self.query.sql_with_params()
+        digest = hashlib.md5(
+            f'{sql}:{params}:{method}:{args}:{get_feed_version()}'.encode()
+        ).hexdigest()
+        key = DATES_KEY.format(digest=digest)
+        values = cache.get(key)
+        if values is None:
+            values = list(getattr(super(), method)(*args))
+            cache.set(key, values, settings.FEED_CACHE_TIMEOUT)
+        return values
+
+    def dates(self, field_name, kind, order='ASC'):
+        return self._cached('dates', field_name, kind, order)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        return self._cached('datetimes', field_name, kind, order, tzinfo)
+
 
+class CachedGroupSelect(AutocompleteSelect):
+    """Поиск группы с подгрузкой вариантов по мере ввода.
 
-class PostAdmin(admin.ModelAdmin):
+    Выводится только выбранная группа, а её название берётся
+    из закешированного списка групп, а не запросом на каждую строку
+    списка постов.
+    """
+
+    def optgroups(self, name, value, attr=None):
+        labels = group_labels()
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for option_value in value:
+            if str(option_value) in self.choices.field.empty_values:
+                continue
+            label = labels.get(str(option_value))
+            if label is not None:
+                default[1].append(self.create_option(
+                    name, option_value, label, True, len(default[1])))
+        return [default]
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """Список без точных COUNT(*) по большим таблицам."""
+    paginator = EstimatedCountPaginator
+    # Не считать все записи таблицы ради «N из M»
+    show_full_result_count = False
+
+
+class PostAdmin(EstimatedCountAdmin):
     list_display = (
         'pk',
         'text',
@@ -14,8 +84,37 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    # select_related() без аргументов пропускает необязательную группу
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('group',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = CachedGroupSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return CachedDatesQuerySet(
+            model=queryset.model,
+            query=queryset.query,
+            using=queryset._db,
+            hints=queryset._hints
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по индексу FTS5 вместо LIKE '%...%' по всей таблице
+        if connection.vendor != 'sqlite' or not fts_query(search_term):
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(
+            search__text__match=fts_query(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -25,11 +124,13 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountAdmin):
     list_display = ('text', 'author', 'post')
+    # Выпадающий список всех комментариев строился бы целиком
+    raw_id_fields = ('parent',)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(EstimatedCountAdmin):
     list_display = ('author', 'user')
 
 
@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+from . import fts
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals  # noqa: F401
+        post_migrate.connect(restore_search_index, sender=self)
+
+
+def restore_search_index(sender, using, **kwargs):
+    """Возвращает триггеры поиска после пересоздания таблицы постов."""
+    connection = connections[using]
+    # Индекс создаёт миграция; до неё и после её отката трогать нечего
+    if fts.TABLE in connection.introspection.table_names():
+        fts.create_index(connection)
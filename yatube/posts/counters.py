@@ -0,0 +1,104 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+# Счётчик пользователя: модель и поле, по которому строки относятся
+# к пользователю
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def recount(user_id):
+    """Пересчитывает счётчики пользователя по таблицам и сохраняет их."""
+    values = {
+        field: model.objects.filter(**{column: user_id}).count()
+        for field, (model, column) in USER_COUNTERS.items()
+    }
+    counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id, defaults=values)
+    return counters
+
+
+def change(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя на delta.
+
+    Запись счётчиков, которой ещё нет, создаётся пересчётом. При удалении
+    её не создаём: пользователь может удаляться вместе со своими постами.
+    """
+    updated = UserCounters.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta})
+    if not updated and delta > 0:
+        recount(user_id)
+
+
+def change_comments(post_id, delta):
+    """Атомарно меняет число комментариев поста на delta."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def for_user(user):
+    """Счётчики пользователя; недостающая запись создаётся пересчётом.
+
+    Чтобы обойтись без запроса, выбирайте пользователя
+    с select_related('counters').
+    """
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return recount(user.pk)
+
+
+def _grouped_counts(model, column):
+    return dict(
+        model.objects.order_by()
+        .values(column)
+        .annotate(count=Count('pk'))
+        .values_list(column, 'count')
+    )
+
+
+def reconcile_users():
+    """Приводит счётчики пользователей в соответствие с таблицами.
+
+    Каждая таблица считается одним запросом с GROUP BY; записываются
+    только разошедшиеся счётчики. Возвращает число исправленных записей.
+    """
+    actual = {
+        field: _grouped_counts(model, column)
+        for field, (model, column) in USER_COUNTERS.items()
+    }
+    existing = {
+        counters.pk: counters for counters in UserCounters.objects.all()
+    }
+    fixed = 0
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        values = {
+            field: counts.get(user_id, 0) for field, counts in actual.items()
+        }
+        counters = existing.get(user_id)
+        if counters is None:
+            UserCounters.objects.create(user_id=user_id, **values)
+        elif any(getattr(counters, field) != value
+                 for field, value in values.items()):
+            UserCounters.objects.filter(pk=user_id).update(**values)
+        else:
+            continue
+        fixed += 1
+    return fixed
+
+
+def reconcile_comments():
+    """Исправляет число комментариев у постов, где оно разошлось."""
+    actual = _grouped_counts(Comment, 'post')
+    fixed = 0
+    posts = Post.objects.values_list('pk', 'comments_count')
+    for post_id, comments_count in posts.iterator():
+        count = actual.get(post_id, 0)
+        if count != comments_count:
+            Post.objects.filter(pk=post_id).update(comments_count=count)
+            fixed += 1
+    return fixed
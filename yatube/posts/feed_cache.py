@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'posts:feed_version'
+COMMENTS_VERSION_KEY = 'posts:comments_version:{post_id}'
+GROUPS_VERSION_KEY = 'posts:groups_version'
+TIMELINE_VERSION_KEY = 'posts:timeline_version:{user_id}'
+PROFILE_VERSION_KEY = 'posts:profile_version:{username}'
+
+
+def get_feed_version():
+    """Текущая версия лент: входит в ключи кеша страниц."""
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = bump_feed_version()
+    return version
+
+
+def bump_feed_version():
+    """Сдвигает версию лент, делая устаревшими все закешированные страницы.
+
+    Версия - время изменения, поэтому она же показывает, когда ленты
+    менялись в последний раз.
+    """
+    version = time.time()
+    cache.set(FEED_VERSION_KEY, version, None)
+    return version
+
+
+def get_comments_version(post_id):
+    """Версия комментариев поста."""
+    key = COMMENTS_VERSION_KEY.format(post_id=post_id)
+    version = cache.get(key)
+    if version is None:
+        version = bump_comments_version(post_id)
+    return version
+
+
+def bump_comments_version(post_id):
+    """Сдвигает версию комментариев поста при их изменении."""
+    version = time.time()
+    cache.set(COMMENTS_VERSION_KEY.format(post_id=post_id), version, None)
+    return version
+
+
+def get_groups_version():
+    """Версия списка групп: по ней обновляются варианты выбора группы."""
+    version = cache.get(GROUPS_VERSION_KEY)
+    if version is None:
+        version = bump_groups_version()
+    return version
+
+
+def bump_groups_version():
+    """Сдвигает версию списка групп при их изменении."""
+    version = time.time()
+    cache.set(GROUPS_VERSION_KEY, version, None)
+    return version
+
+
+def get_timeline_version(user_id):
+    """Версия подписок пользователя: лента подписок зависит и от неё."""
+    key = TIMELINE_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = bump_timeline_version(user_id)
+    return version
+
+
+def bump_timeline_version(user_id):
+    """Сдвигает версию подписок пользователя при подписке и отписке."""
+    version = time.time()
+    cache.set(TIMELINE_VERSION_KEY.format(user_id=user_id), version, None)
+    return version
+
+
+def get_profile_version(username):
+    """Версия счётчиков подписок на странице профиля."""
+    key = PROFILE_VERSION_KEY.format(username=username)
+    version = cache.get(key)
+    if version is None:
+        version = bump_profile_version(username)
+    return version
+
+
+def bump_profile_version(username):
+    """Сдвигает версию профиля, когда меняются его подписки."""
+    version = time.time()
+    cache.set(PROFILE_VERSION_KEY.format(username=username), version, None)
+    return version
@@ -1,5 +1,6 @@
 from django import forms
 
+from .group_choices import use_lazy_select
 from .models import Comment, Post
 
 
@@ -8,6 +9,12 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # В разметке только выбранная группа, остальные подгружаются
+        # по мере ввода из списка в памяти процесса
+        use_lazy_select(self.fields['group'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,72 @@
+from django.db import models
+
+# Полнотекстовый индекс постов: внешняя FTS5-таблица над posts_post.
+# Сам текст хранится только в posts_post, индекс синхронизируют триггеры.
+TABLE = 'posts_post_fts'
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS = {
+    f'{TABLE}_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+    f'{TABLE}_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} ({TABLE}, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    f'{TABLE}_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} ({TABLE}, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        f'INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+REBUILD = f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')"
+
+
+def create_index(connection, rebuild=False):
+    """Создаёт таблицу индекса и триггеры, если их ещё нет.
+
+    SQLite пересоздаёт таблицу posts_post при изменении её схемы
+    в миграциях, и триггеры при этом пропадают, поэтому вызов
+    повторяется после каждой миграции.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        if rebuild:
+            cursor.execute(REBUILD)
+
+
+def drop_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class SearchField(models.TextField):
+    """Столбец FTS5-таблицы, по которому ищут через lookup match."""
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
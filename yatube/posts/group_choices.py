@@ -0,0 +1,102 @@
+from django import forms
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+
+from core.db import primary_after_change
+
+from .feed_cache import get_groups_version
+from .models import Group
+
+# Варианты выбора группы этого процесса: версия -> [(pk, название)]
+_choices = {}
+
+
+def group_choices():
+    """Все группы как варианты выбора: (pk, название).
+
+    Список строится один раз на процесс и версию групп; сигналы
+    сдвигают версию при сохранении и удалении группы.
+    """
+    version = get_groups_version()
+    choices = _choices.get(version)
+    if choices is None:
+        with primary_after_change(version):
+            choices = [
+                (pk, title) for pk, title
+                in Group.objects.order_by('pk').values_list('pk', 'title')
+            ]
+        _choices.clear()
+        _choices[version] = choices
+    return choices
+
+
+def group_labels():
+    """Названия групп по строковому pk, как значения виджетов."""
+    return {str(pk): title for pk, title in group_choices()}
+
+
+class CachedGroupIterator(ModelChoiceIterator):
+    """Варианты поля группы без запроса к базе при каждой отрисовке."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from group_choices()
+
+    def __len__(self):
+        return len(group_choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(group_choices())
+
+
+def use_cached_choices(field):
+    """Переключает ModelChoiceField групп на закешированные варианты.
+
+    Тип поля не меняется: меняется только итератор вариантов.
+    """
+    field.iterator = CachedGroupIterator
+    field.widget.choices = field.choices
+    return field
+
+
+def search_groups(term, limit):
+    """Группы, в названии которых есть term, из закешированного списка."""
+    term = term.strip().lower()
+    return [
+        (pk, title) for pk, title in group_choices()
+        if term in title.lower()
+    ][:limit]
+
+
+class LazyGroupSelect(forms.Select):
+    """Выбор группы, варианты которого подгружаются по мере ввода.
+
+    В разметке только пустой вариант и выбранная группа, остальные
+    group_select.js запрашивает у posts:group_autocomplete.
+    """
+
+    def __init__(self, attrs=None):
+        super().__init__(attrs)
+        self.attrs.setdefault(
+            'data-autocomplete', reverse_lazy('posts:group_autocomplete'))
+
+    def optgroups(self, name, value, attrs=None):
+        labels = group_labels()
+        options = []
+        if self.choices.field.empty_label is not None:
+            options.append(self.create_option(
+                name, '', self.choices.field.empty_label, not any(value), 0))
+        for option_value in value:
+            label = labels.get(str(option_value))
+            if label is not None:
+                options.append(self.create_option(
+                    name, option_value, label, True, len(options)))
+        return [(None, options, 0)]
+
+
+def use_lazy_select(field):
+    """Ставит полю группы LazyGroupSelect с закешированными вариантами."""
+    field.widget = LazyGroupSelect()
+    field.widget.is_required = field.required
+    return use_cached_choices(field)
@@ -0,0 +1,35 @@
+import hashlib
+from collections import namedtuple
+
+from django.core.files.images import get_image_dimensions
+
+ImageMetadata = namedtuple(
+    'ImageMetadata', ('width', 'height', 'size', 'hash'))
+
+
+def read_metadata(file):
+    """Размеры, длина в байтах и SHA-256 содержимого картинки.
+
+    Файл читается один раз по частям; позиция в файле не меняется.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    width, height = get_image_dimensions(file)
+    return ImageMetadata(width, height, size, digest.hexdigest())
+
+
+def find_duplicate(post, digest):
+    """Имя уже сохранённого файла с тем же содержимым или None."""
+    names = (
+        type(post).objects.filter(image_hash=digest)
+        .exclude(pk=post.pk)
+        .exclude(image='')
+        .values_list('image', flat=True)
+    )
+    for name in names[:1]:
+        if post.image.storage.exists(name):
+            return name
+    return None
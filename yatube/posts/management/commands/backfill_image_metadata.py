@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import read_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры и хеш картинок у постов, '
+            'загруженных до появления этих полей')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dedupe', action='store_true',
+            help='Переводить посты с одинаковыми картинками на один файл '
+                 'и удалять ставшие ненужными копии'
+        )
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='')
+            .filter(image_hash='')
+            .only('pk', 'image')
+            .order_by('pk')
+        )
+        # Первый файл с данным содержимым; остальные становятся копиями
+        originals = dict(
+            Post.objects.exclude(image_hash='')
+            .order_by('-pk')
+            .values_list('image_hash', 'image')
+        )
+        updated = missing = removed = 0
+        for post in posts.iterator():
+            storage = post.image.storage
+            if not storage.exists(post.image.name):
+                missing += 1
+                continue
+            with post.image.open('rb'):
+                metadata = read_metadata(post.image)
+            fields = {
+                'image_width': metadata.width,
+                'image_height': metadata.height,
+                'image_size': metadata.size,
+                'image_hash': metadata.hash,
+            }
+            original = originals.setdefault(metadata.hash, post.image.name)
+            if options['dedupe'] and original != post.image.name:
+                fields['image'] = original
+            # update() не вызывает сигналы: ленты не меняются
+            Post.objects.filter(pk=post.pk).update(**fields)
+            updated += 1
+            if 'image' in fields and not Post.objects.filter(
+                    image=post.image.name).exists():
+                storage.delete(post.image.name)
+                removed += 1
+        self.stdout.write(
+            f'Обновлено постов: {updated}, файлов не найдено: {missing}, '
+            f'удалено копий: {removed}'
+        )
@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры всех размеров для уже загруженных картинок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS,
+            help='Число процессов для создания миниатюр'
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        tasks = [
+            (name, geometry, thumbnail_options)
+            for name in names
+            for geometry, thumbnail_options
+            in settings.POST_THUMBNAILS.values()
+        ]
+        # Дочерним процессам не должны достаться открытые соединения
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(generate, *task) for task in tasks]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(str(error))
+        self.stdout.write(
+            f'Миниатюр обработано: {len(tasks) - failed}, ошибок: {failed}')
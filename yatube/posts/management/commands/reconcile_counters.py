@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_comments, reconcile_users
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписок и комментариев '
+            'и исправляет разошедшиеся')
+
+    def handle(self, *args, **options):
+        users = reconcile_users()
+        posts = reconcile_comments()
+        self.stdout.write(
+            f'Исправлено счётчиков пользователей: {users}, '
+            f'постов: {posts}'
+        )
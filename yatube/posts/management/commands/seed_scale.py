@@ -0,0 +1,332 @@
+import io
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, LPad
+from django.utils import timezone
+from PIL import Image
+
+from posts.counters import reconcile_comments, reconcile_users
+from posts.feed_cache import bump_feed_version
+from posts.images import read_metadata
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+WORDS = (
+    'город', 'утро', 'кофе', 'книга', 'дорога', 'море', 'лес', 'работа',
+    'проект', 'код', 'ошибка', 'релиз', 'кот', 'собака', 'погода', 'дождь',
+    'солнце', 'зима', 'лето', 'поезд', 'друзья', 'музыка', 'концерт',
+    'фильм', 'сериал', 'ужин', 'рецепт', 'пирог', 'прогулка', 'парк',
+    'фото', 'горы', 'река', 'отпуск', 'билет', 'встреча', 'идея', 'план',
+    'неделя', 'выходные', 'новости', 'история', 'вопрос', 'ответ', 'спорт',
+    'бег', 'велосипед', 'дом', 'сад', 'цветы', 'чай', 'письмо', 'урок',
+    'экзамен', 'конференция', 'доклад', 'база', 'запрос', 'индекс', 'кеш',
+)
+FIRST_NAMES = (
+    'Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена', 'Дмитрий',
+    'Наталья', 'Алексей', 'Ирина', 'Михаил', 'Татьяна', 'Николай',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров',
+    'Соколов', 'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков',
+)
+
+
+class PowerLaw:
+    """Выбор элементов с вероятностью, пропорциональной 1 / rank ** skew.
+
+    Элементы перемешиваются, чтобы «популярными» оказались не первые
+    по id записи.
+    """
+
+    def __init__(self, rng, items, skew):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)))
+
+    def sample(self, k):
+        return self.rng.choices(
+            self.items, cum_weights=self.cum_weights, k=k)
+
+    def choice(self):
+        return self.sample(1)[0]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет bulk_create записать свои даты в поля с auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу большим воспроизводимым набором данных '
+            'для измерения производительности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows-per-user', type=float, default=20,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument(
+            '--group-ratio', type=float, default=0.7,
+            help='Доля постов, опубликованных в группе')
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.1,
+            help='Доля постов с картинкой')
+        parser.add_argument(
+            '--image-pool', type=int, default=20,
+            help='Сколько разных картинок создать для постов')
+        parser.add_argument(
+            '--skew', type=float, default=1.2,
+            help='Показатель степенного закона для популярности авторов, '
+                 'групп и постов')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до сегодняшнего распределить посты')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и адресов групп')
+        parser.add_argument(
+            '--password', default=None,
+            help='Общий пароль пользователей; без него вход невозможен')
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не раскладывать посты по лентам подписок')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Конец интервала - полночь, чтобы данные не зависели от часа запуска
+        self.end = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=options['days'])
+
+        user_ids = self.stage('Пользователи', self.create_users)
+        group_ids = self.stage('Группы', self.create_groups)
+        follows = self.stage(
+            'Подписки', lambda: self.create_follows(user_ids))
+        images = self.stage('Картинки', self.create_images)
+        posts = self.stage(
+            'Посты', lambda: self.create_posts(user_ids, group_ids, images))
+        self.stage(
+            'Комментарии', lambda: self.create_comments(user_ids, posts))
+        self.stage('Счётчики', self.update_counters)
+        if not options['skip_timelines']:
+            self.stage('Ленты', lambda: self.fill_timelines(follows, posts))
+        bump_feed_version()
+
+    def stage(self, title, function):
+        started = time.monotonic()
+        with transaction.atomic():
+            result = function()
+        self.stdout.write(
+            f'{title}: {time.monotonic() - started:.1f} с')
+        return result
+
+    def bulk_create(self, model, objects, **kwargs):
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+
+    def random_text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        # Хеш пароля считается один раз: он медленный намеренно
+        password = make_password(self.options['password'])
+        self.bulk_create(User, (
+            User(
+                username=f'{prefix}{i}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.start
+            )
+            for i in range(self.options['users'])
+        ), ignore_conflicts=True)
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .values_list('pk', flat=True)
+        )
+
+    def create_groups(self):
+        prefix = self.options['prefix']
+        self.bulk_create(Group, (
+            Group(
+                title=f'Группа {i}',
+                slug=f'{prefix}-group-{i}',
+                description=self.random_text(20)
+            )
+            for i in range(self.options['groups'])
+        ), ignore_conflicts=True)
+        return list(
+            Group.objects.filter(slug__startswith=f'{prefix}-group-')
+            .values_list('pk', flat=True)
+        )
+
+    def create_follows(self, user_ids):
+        """Подписки: читатель случайный, автор - по степенному закону."""
+        if len(user_ids) < 2:
+            return []
+        authors = PowerLaw(self.rng, user_ids, self.options['skew'])
+        total = int(len(user_ids) * self.options['follows_per_user'])
+        pairs = set()
+        for _ in range(total):
+            user_id, author_id = self.rng.choice(user_ids), authors.choice()
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        pairs = sorted(pairs)
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ), ignore_conflicts=True)
+        return pairs
+
+    def create_images(self):
+        """Небольшой набор картинок, на которые ссылаются посты."""
+        if not self.options['image_ratio']:
+            return []
+        images = []
+        for i in range(self.options['image_pool']):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (1280, 720), color).save(buffer, 'PNG')
+            name = default_storage.save(
+                f'posts/{self.options["prefix"]}-{i}.png',
+                ContentFile(buffer.getvalue())
+            )
+            with default_storage.open(name) as file:
+                images.append((name, read_metadata(file)))
+        return images
+
+    def create_posts(self, user_ids, group_ids, images):
+        """Посты популярных авторов и групп встречаются чаще.
+
+        Даты растут вместе с id, как при настоящей публикации.
+        Возвращает список (id, автор, дата) созданных постов.
+        """
+        if not user_ids:
+            return []
+        skew = self.options['skew']
+        authors = PowerLaw(self.rng, user_ids, skew)
+        groups = PowerLaw(self.rng, group_ids, skew) if group_ids else None
+        total = self.options['posts']
+        span = (self.end - self.start).total_seconds()
+        dates = sorted(
+            self.rng.uniform(0, span) for _ in range(total))
+        last_id = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+        def generate():
+            for offset in dates:
+                post = Post(
+                    author_id=authors.choice(),
+                    text=self.random_text(
+                        min(int(self.rng.paretovariate(1.5) * 8), 300)),
+                    pub_date=self.start + timedelta(seconds=offset)
+                )
+                if groups and self.rng.random() < self.options['group_ratio']:
+                    post.group_id = groups.choice()
+                if images and self.rng.random() < self.options['image_ratio']:
+                    name, metadata = self.rng.choice(images)
+                    post.image = name
+                    post.set_image_metadata(metadata)
+                yield post
+
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.bulk_create(Post, generate())
+        return list(
+            Post.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', 'author_id', 'pub_date')
+        )
+
+    def create_comments(self, user_ids, posts):
+        """Комментарии сосредоточены на немногих «горячих» постах."""
+        if not posts or not user_ids:
+            return
+        hot_posts = PowerLaw(self.rng, posts, self.options['skew'])
+
+        def generate():
+            for _ in range(self.options['comments']):
+                post_id, _, pub_date = hot_posts.choice()
+                created = min(
+                    pub_date + timedelta(
+                        hours=self.rng.expovariate(1 / 12)),
+                    self.end
+                )
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=self.random_text(self.rng.randint(2, 30)),
+                    created=created
+                )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk_create(Comment, generate())
+        # bulk_create не вызывает Comment.save(): путь и ветка
+        # заполняются, как в миграции 0019, - все комментарии верхнего
+        # уровня
+        Comment.objects.filter(thread__isnull=True).update(
+            thread=F('id'),
+            path=LPad(Cast('id', CharField()), Comment.PATH_STEP, Value('0'))
+        )
+
+    def update_counters(self):
+        # bulk_create не вызывает сигналы, счётчики пересчитываются целиком
+        reconcile_users()
+        reconcile_comments()
+
+    def fill_timelines(self, follows, posts):
+        """Раскладывает посты по лентам так же, как при публикации."""
+        followers = {}
+        for _, author_id in follows:
+            followers[author_id] = followers.get(author_id, 0) + 1
+        latest = {}
+        for post_id, author_id, pub_date in reversed(posts):
+            author_posts = latest.setdefault(author_id, [])
+            if len(author_posts) < settings.TIMELINE_BACKFILL_SIZE:
+                author_posts.append((post_id, pub_date))
+        self.bulk_create(TimelineEntry, (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for user_id, author_id in follows
+            if followers[author_id] < settings.TIMELINE_FANOUT_LIMIT
+            for post_id, pub_date in latest.get(author_id, ())
+        ), ignore_conflicts=True)
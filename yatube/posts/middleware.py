@@ -0,0 +1,107 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from core.db import primary_after_change
+
+from .feed_cache import (get_comments_version, get_feed_version,
+                         get_profile_version)
+
+# Страницы, которые гостям отдаются из кеша целиком
+CACHED_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+)
+# Страницы, зависящие от комментариев поста
+COMMENTS_VIEWS = ('posts:post_detail', 'posts:post_comments')
+PAGE_KEY = 'posts:page:{etag}'
+
+
+def page_last_modified(match):
+    """Время последнего изменения данных, из которых собрана страница."""
+    last_modified = get_feed_version()
+    if match.view_name in COMMENTS_VIEWS:
+        last_modified = max(
+            last_modified, get_comments_version(match.kwargs['post_id']))
+    if match.view_name == 'posts:profile':
+        last_modified = max(
+            last_modified, get_profile_version(match.kwargs['username']))
+    return last_modified
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеш страниц лент целиком для неавторизованных посетителей.
+
+    ETag и Last-Modified строятся из версий лент, комментариев и профилей,
+    поэтому ответ 304 на условный запрос отдаётся без шаблонов и запросов
+    к базе.
+    Авторизованные пользователи получают страницу как обычно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return self.get_response(request)
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        if match.view_name not in CACHED_VIEWS:
+            return self.get_response(request)
+        # Страница может не дойти до представления: имя для метрик
+        request.resolver_match = match
+
+        last_modified = page_last_modified(match)
+        etag = quote_etag(hashlib.md5(
+            f'{request.get_full_path()}:{last_modified}'.encode()
+        ).hexdigest())
+        # В Last-Modified целые секунды: версия округляется вверх, чтобы
+        # не выдавать страницу за более старую. Пока эта секунда
+        # не прошла, данные могут снова измениться с тем же значением
+        # заголовка, поэтому до её конца страница проверяется только
+        # по ETag
+        modified = math.ceil(last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=modified)
+        if response is None:
+            response = self.cached_response(request, etag, last_modified)
+        response['ETag'] = etag
+        if time.time() >= modified:
+            response['Last-Modified'] = http_date(modified)
+        patch_cache_control(response, max_age=0)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def cached_response(self, request, etag, last_modified):
+        key = PAGE_KEY.format(etag=etag.strip('"'))
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        # Ответ попадёт в кеш под новой версией: если данные только что
+        # изменились, реплика могла их ещё не получить
+        with primary_after_change(last_modified):
+            response = self.get_response(request)
+        # Ответы, которые ставят cookie, относятся к одному посетителю
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+            )
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.fts
+
+
+def create_index(apps, schema_editor):
+    """Создаёт индекс FTS5 и заполняет его существующими постами."""
+    posts.fts.create_index(schema_editor.connection, rebuild=True)
+
+
+def drop_index(apps, schema_editor):
+    posts.fts.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Post')),
+                ('text', posts.fts.SearchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
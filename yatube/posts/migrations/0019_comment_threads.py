@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, LPad
+
+
+def fill_threads(apps, schema_editor):
+    """Существующие комментарии становятся ветками верхнего уровня."""
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.update(
+        thread=F('id'),
+        path=LPad(Cast('id', CharField()), 10, Value('0'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на комментарий'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_threads, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'thread', 'path'], name='comment_post_thread_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', 'path'], name='comment_post_depth_path_idx'),
+        ),
+    ]
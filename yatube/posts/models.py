@@ -1,6 +1,10 @@
 # posts/models.py
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from .fts import SearchField
+from .images import ImageMetadata, find_duplicate, read_metadata
 
 User = get_user_model()
 
@@ -35,15 +39,94 @@ class Post(models.Model):
     )
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
+    # Сведения о картинке сохраняются при загрузке, чтобы страницы
+    # выводились без чтения файла
+    image_width = models.PositiveIntegerField(
+        null=True, editable=False, verbose_name='Ширина картинки')
+    image_height = models.PositiveIntegerField(
+        null=True, editable=False, verbose_name='Высота картинки')
+    image_size = models.PositiveIntegerField(
+        null=True, editable=False, verbose_name='Размер картинки, байт')
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='SHA-256 картинки'
+    )
+    # Счётчик поддерживается сигналами, чтобы не считать COUNT(*)
+    comments_count = models.IntegerField(
+        default=0, editable=False, verbose_name='Число комментариев')
 
     class Meta:
-        ordering = ('-pub_date',)
+        # id различает посты с одинаковой датой: номерные страницы
+        # и курсоры идут в одном порядке, как индексы ниже
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы повторяют фильтры и сортировку лент, чтобы страницы
+        # читались по индексу без сортировки во временном B-дереве
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        if not self.image:
+            self.set_image_metadata(None)
+        elif not self.image._committed:
+            # Новая загрузка: одинаковые файлы хранятся один раз
+            metadata = read_metadata(self.image)
+            duplicate = find_duplicate(self, metadata.hash)
+            if duplicate:
+                self.image = duplicate
+            self.set_image_metadata(metadata)
+        super().save(*args, **kwargs)
+
+    def set_image_metadata(self, metadata):
+        """Записывает в поля поста размеры и хеш картинки."""
+        if metadata is None:
+            metadata = ImageMetadata(None, None, None, '')
+        self.image_width = metadata.width
+        self.image_height = metadata.height
+        self.image_size = metadata.size
+        self.image_hash = metadata.hash
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов (FTS5).
+
+    Таблицу создаёт миграция, а заполняют триггеры; модель нужна, чтобы
+    присоединять индекс к запросам постов.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search'
+    )
+    text = SearchField()
+    # Скрытый столбец FTS5: релевантность (bm25), меньше - лучше
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -74,10 +157,88 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='replies',
+        verbose_name='Ответ на комментарий'
+    )
+    # Материализованный путь: id предков и самого комментария, каждый
+    # дополнен нулями до PATH_STEP цифр. Ветка ответов комментария -
+    # непрерывный диапазон путей, который читается по индексу
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # id комментария верхнего уровня, с которого начинается ветка
+    thread = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+
+    # Длина одного шага пути и символ больше любой цифры: пути ветки
+    # лежат в диапазоне (path, path + PATH_END)
+    PATH_STEP = 10
+    PATH_END = '~'
 
     class Meta:
+        ordering = ('created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+            # Ветки по порядку и ответы внутри каждой в порядке обхода
+            models.Index(
+                fields=['post', 'thread', 'path'],
+                name='comment_post_thread_path_idx'
+            ),
+            # Страница веток: комментарии верхнего уровня по порядку
+            models.Index(
+                fields=['post', 'depth', 'path'],
+                name='comment_post_depth_path_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.path:
+            return super().save(*args, **kwargs)
+        if self.parent is not None:
+            if self.parent.depth >= settings.COMMENTS_MAX_DEPTH:
+                # Слишком глубокий ответ попадает к предку
+                # на последнем разрешённом уровне
+                self.parent = Comment.objects.get(
+                    pk=self.ancestor_id(settings.COMMENTS_MAX_DEPTH - 1))
+            self.post_id = self.parent.post_id
+            self.depth = self.parent.depth + 1
+        # Шаг пути - id, который известен только после вставки.
+        # Путь записывается через save, чтобы сигналы сбросили кеш
+        # комментариев уже с готовым путём
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.parent is None:
+                self.thread = self.pk
+                self.path = str(self.pk).zfill(self.PATH_STEP)
+            else:
+                self.thread = self.parent.thread
+                self.path = (
+                    self.parent.path + str(self.pk).zfill(self.PATH_STEP))
+            super().save(update_fields=['path', 'thread'])
+
+    def ancestor_id(self, depth):
+        """id предка на уровне depth; для ответа - по пути родителя."""
+        path = self.path or self.parent.path
+        start = depth * self.PATH_STEP
+        return int(path[start:start + self.PATH_STEP])
+
+    def subtree(self):
+        """Все ответы в ветке комментария, в порядке обхода дерева."""
+        return Comment.objects.filter(
+            post_id=self.post_id,
+            thread=self.thread,
+            path__gt=self.path,
+            path__lt=self.path + self.PATH_END
+        ).order_by('path')
 
 
 class Follow(models.Model):
@@ -101,3 +262,115 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые иначе считались бы COUNT(*).
+
+    Обновляются сигналами при создании и удалении постов и подписок;
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.IntegerField(
+        default=0, verbose_name='Число постов')
+    followers_count = models.IntegerField(
+        default=0, verbose_name='Число подписчиков')
+    following_count = models.IntegerField(
+        default=0, verbose_name='Число подписок')
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок, разложенная по подписчикам при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Автор и дата копируются из поста, чтобы отписка и сортировка
+    # ленты обходились без обращения к таблице постов
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class Notification(models.Model):
+    """Письмо подписчику о новом посте, которое ещё ждёт отправки.
+
+    Отправленные уведомления хранятся NOTIFICATION_DIGEST_INTERVAL
+    секунд: по ним видно, когда пользователь получил последнее письмо.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(
+        null=True, blank=True, verbose_name='Отправлено')
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_notification'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['sent', 'user'],
+                name='notification_sent_user_idx'
+            ),
+        ]
@@ -0,0 +1,161 @@
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core import jobs
+
+from .models import Follow, Notification, Post, User
+
+SEND_KEY = 'posts:send_notifications:{slot}'
+
+
+def schedule_sending(at=None):
+    """Ставит отправку писем на ближайшую границу окна.
+
+    Все посты, опубликованные в одном окне NOTIFICATION_SEND_DELAY
+    секунд, отправляются одной задачей: ключ задачи - номер окна.
+    """
+    window = settings.NOTIFICATION_SEND_DELAY
+    at = at or time.time() + window
+    slot = math.ceil(at / window)
+    jobs.enqueue(
+        'posts.send_notifications',
+        key=SEND_KEY.format(slot=slot),
+        delay=max(slot * window - time.time(), 0)
+    )
+
+
+def fan_out(post_id):
+    """Создаёт уведомления о посте для подписчиков автора.
+
+    Подписчики читаются пачками по ключу, поэтому память и длина
+    транзакций не зависят от их числа. Повторный запуск ничего
+    не дублирует.
+    """
+    author_id = (
+        Post.objects.filter(pk=post_id)
+        .values_list('author_id', flat=True).first()
+    )
+    if author_id is None:
+        return
+    followers = (
+        Follow.objects.filter(author_id=author_id)
+        .exclude(user__email='')
+        .order_by('pk')
+        .values_list('pk', 'user_id')
+    )
+    last_pk = 0
+    while True:
+        chunk = list(
+            followers.filter(pk__gt=last_pk)
+            [:settings.NOTIFICATION_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, post_id=post_id)
+             for _, user_id in chunk],
+            ignore_conflicts=True
+        )
+        last_pk = chunk[-1][0]
+    schedule_sending()
+
+
+def render_message(posts):
+    """Тема и текст письма о постах; одинаковы для всех получателей."""
+    context = {'posts': posts, 'site_url': settings.SITE_URL}
+    if len(posts) == 1:
+        subject = f'Новый пост: {posts[0].author.get_username()}'
+    else:
+        subject = f'Новые посты в ваших подписках: {len(posts)}'
+    return subject, render_to_string('posts/emails/new_posts.txt', context)
+
+
+def send_pending():
+    """Отправляет ждущие уведомления пользователям, которым уже можно.
+
+    Пользователь получает не больше одного письма за
+    NOTIFICATION_DIGEST_INTERVAL секунд: посты, вышедшие за это время,
+    придут одним дайджестом. Письмо с одним и тем же набором постов
+    отрисовывается один раз, а все письма уходят через одно
+    соединение. Возвращает число отправленных писем.
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.NOTIFICATION_DIGEST_INTERVAL)
+    Notification.objects.filter(sent__lt=since).delete()
+    recent = Notification.objects.filter(sent__gte=since).values('user_id')
+    pending = Notification.objects.filter(sent__isnull=True)
+    due = pending.exclude(user_id__in=recent)
+
+    rendered = {}
+    sent = 0
+    last_user = 0
+    with mail.get_connection() as connection:
+        while True:
+            users = list(
+                due.filter(user_id__gt=last_user)
+                .order_by('user_id')
+                .values_list('user_id', flat=True)
+                .distinct()[:settings.NOTIFICATION_CHUNK_SIZE]
+            )
+            if not users:
+                break
+            last_user = users[-1]
+            sent += send_batch(connection, due, users, rendered, now)
+
+    # Остальные получат дайджест, когда истечёт интервал после письма
+    waiting = Notification.objects.filter(
+        sent__isnull=False,
+        user_id__in=pending.values('user_id')
+    ).aggregate(first=Min('sent'))['first']
+    if waiting is not None:
+        schedule_sending(
+            waiting.timestamp() + settings.NOTIFICATION_DIGEST_INTERVAL)
+    return sent
+
+
+def send_batch(connection, due, users, rendered, now):
+    """Отправляет письма пачке пользователей users."""
+    notifications = list(
+        due.filter(user_id__in=users)
+        .order_by('user_id', 'post_id')
+        .values_list('pk', 'user_id', 'post_id')
+    )
+    post_sets = {}
+    for _, user_id, post_id in notifications:
+        post_sets.setdefault(user_id, []).append(post_id)
+    post_sets = {user: tuple(posts) for user, posts in post_sets.items()}
+
+    missing = {
+        post_id
+        for posts in post_sets.values() if posts not in rendered
+        for post_id in posts
+    }
+    posts = Post.objects.select_related('author', 'group').in_bulk(missing)
+    for post_ids in set(post_sets.values()) - set(rendered):
+        found = [posts[post_id] for post_id in post_ids if post_id in posts]
+        # Посты могли удалить, пока уведомления ждали отправки
+        rendered[post_ids] = render_message(found) if found else None
+
+    emails = dict(
+        User.objects.filter(pk__in=post_sets).values_list('pk', 'email'))
+    messages = [
+        mail.EmailMessage(
+            *rendered[post_ids],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[emails[user_id]],
+            connection=connection
+        )
+        for user_id, post_ids in post_sets.items()
+        if rendered[post_ids] and emails.get(user_id)
+    ]
+    connection.send_messages(messages)
+    Notification.objects.filter(
+        pk__in=[pk for pk, _, _ in notifications]).update(sent=now)
+    return len(messages)
@@ -0,0 +1,260 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+# Направления перехода, которые запоминаются в курсоре
+NEXT = 'n'
+PREVIOUS = 'p'
+# Пропуск в списке номеров страниц
+ELLIPSIS = '…'
+COUNT_KEY = 'posts:count:{digest}'
+ADMIN_COUNT_KEY = 'posts:admin_count:{digest}'
+
+
+class InvalidCursor(Exception):
+    """Курсор повреждён или не соответствует сортировке ленты."""
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу сортировки (keyset).
+
+    Вместо COUNT(*) и OFFSET следующая страница выбирается условием
+    «строго после последней записи», поэтому время запроса не зависит
+    от того, насколько глубоко пролистана лента.
+    """
+
+    # Сортировка по умолчанию: новые записи первыми, id различает
+    # записи с одинаковой датой
+    default_ordering = ('-pub_date', '-id')
+
+    def __init__(self, queryset, per_page, ordering=None):
+        # Явная сортировка queryset (order_by) важнее умолчания
+        self.ordering = tuple(
+            ordering or queryset.query.order_by or self.default_ordering)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self._fields = [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def _field(self, name):
+        # Поле сортировки может быть аннотацией queryset
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        """Упаковывает значения полей сортировки в непрозрачный токен."""
+        values = []
+        for name, _ in self._fields:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Возвращает направление и значения полей из токена."""
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (NEXT, PREVIOUS):
+                raise InvalidCursor(token)
+            if len(values) != len(self._fields):
+                raise InvalidCursor(token)
+            return direction, [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self._fields, values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor(token)
+
+    def _keyset_filter(self, values, backwards):
+        # (a, b) < (x, y) раскрывается в a < x OR (a = x AND b < y)
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу после (или перед) позицией курсора.
+
+        Некорректный курсор, как и отсутствующий, даёт первую страницу.
+        """
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+
+        backwards = direction == PREVIOUS and values is not None
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+
+        # Лишняя запись показывает, есть ли что-то дальше
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if not backwards:
+            return CursorPage(items, self, values is not None, has_more)
+        if not has_more:
+            # Дошли до начала ленты: отдаём полную первую страницу
+            return self.get_page()
+        items.reverse()
+        return CursorPage(items, self, True, True)
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Наследует Page, чтобы шаблоны, перебирающие page_obj, работали
+    без изменений; номера страниц и общее количество не вычисляются.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        super().__init__(object_list, None, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
+
+
+def next_cursor(page):
+    """Курсор записей после страницы page или None, если их нет.
+
+    С него продолжается бесконечная прокрутка, в том числе после
+    номерной страницы: курсор строится по её последней записи.
+    """
+    if getattr(page, 'is_cursor', False):
+        return page.next_cursor
+    if not page.has_next():
+        return None
+    paginator = CursorPaginator(
+        page.paginator.object_list, page.paginator.per_page)
+    return paginator.encode_cursor(page[len(page) - 1], NEXT)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с закешированным числом объектов.
+
+    COUNT(*) по ленте выполняется один раз на версию: version входит
+    в ключ кеша, поэтому любое изменение постов (сигналы сдвигают
+    версию лент) делает сохранённое число устаревшим.
+    """
+
+    def __init__(self, object_list, per_page, version=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.version = version
+
+    @cached_property
+    def count(self):
+        if self.version is None or not hasattr(self.object_list, 'query'):
+            return super().count
+        sql, params = self.object_list.query.sql_with_params()
+        key = COUNT_KEY.format(digest=hashlib.md5(
+            f'{sql}:{params}:{self.version}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator админки, который не считает COUNT(*) по всей таблице.
+
+    Без фильтров число записей оценивается по наибольшему первичному
+    ключу (удалённые записи его не уменьшают). С фильтрами записи
+    считаются точно до ADMIN_EXACT_COUNT_LIMIT, а большее число
+    кешируется на ADMIN_COUNT_CACHE_TIMEOUT секунд.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        if not queryset.query.where:
+            estimate = queryset.model._default_manager.aggregate(
+                last=Max('pk'))['last'] or 0
+            if estimate > limit:
+                return estimate
+            return super().count
+        sql, params = queryset.query.sql_with_params()
+        key = ADMIN_COUNT_KEY.format(
+            digest=hashlib.md5(f'{sql}:{params}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is not None:
+            return count
+        # COUNT по подзапросу с LIMIT читает не больше limit + 1 строк
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            count = super().count
+            cache.set(key, count, settings.ADMIN_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+def elided_page_range(page, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей, первые и последние.
+
+    Остальные номера заменяются на ELLIPSIS, так что длина списка
+    не зависит от числа страниц.
+    """
+    number = page.number
+    num_pages = page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages += list(range(1, on_ends + 1)) + [ELLIPSIS]
+        pages += list(range(number - on_each_side, number + 1))
+    else:
+        pages += list(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages += list(range(number + 1, number + on_each_side + 1))
+        pages += [ELLIPSIS]
+        pages += list(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages += list(range(number + 1, num_pages + 1))
+    return pages
@@ -0,0 +1,40 @@
+import re
+
+from django.db import connection
+from django.db.models import F
+
+from .models import Post
+
+WORD = re.compile(r'\w+')
+
+
+def fts_query(text):
+    """Запрос FTS5 из слов пользователя.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 во вводе
+    не ломали запрос; последнее слово ищется как префикс.
+    """
+    terms = [f'"{word}"' for word in WORD.findall(text)]
+    if not terms:
+        return ''
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_posts(text):
+    """Посты, содержащие все слова запроса, от самых релевантных.
+
+    Сортировка (search_rank, -id) годится для курсорной пагинации.
+    """
+    query = fts_query(text)
+    if not query:
+        return Post.objects.none()
+    if connection.vendor != 'sqlite':
+        # Индекс FTS5 есть только в SQLite
+        return Post.objects.filter(text__icontains=text).order_by(
+            '-pub_date', '-id')
+    return (
+        Post.objects.filter(search__text__match=query)
+        .annotate(search_rank=F('search__rank'))
+        .order_by('search_rank', '-id')
+    )
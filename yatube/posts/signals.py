@@ -0,0 +1,129 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import jobs
+
+from . import counters, timeline
+from .feed_cache import (bump_comments_version, bump_feed_version,
+                         bump_groups_version, bump_profile_version,
+                         bump_timeline_version)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change(instance.author_id, 'followers_count', 1)
+        counters.change(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change(instance.author_id, 'followers_count', -1)
+    counters.change(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Раскладывает новый пост по лентам подписчиков."""
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def notify_followers(sender, instance, created, **kwargs):
+    """Письма подписчикам уходят из очереди, а не из запроса."""
+    if created:
+        jobs.enqueue(
+            'posts.notify_followers', {'post_id': instance.pk},
+            key=f'posts:notify:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    """После подписки добавляет в ленту посты автора."""
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    """После отписки убирает из ленты посты автора; если автор стал
+       ниже порога раскладки, его посты раскладываются остальным."""
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.backfill_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_timeline(sender, instance, **kwargs):
+    """Подписка и отписка меняют ленту подписок пользователя."""
+    bump_timeline_version(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profiles(sender, instance, **kwargs):
+    """Подписка меняет счётчики в профилях подписчика и автора."""
+    usernames = User.objects.filter(
+        pk__in=(instance.user_id, instance.author_id)
+    ).values_list('username', flat=True)
+    for username in usernames:
+        bump_profile_version(username)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def invalidate_feeds(sender, **kwargs):
+    """Любое изменение постов и групп сбрасывает кеш лент."""
+    bump_feed_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_feeds_on_user_change(sender, update_fields=None, **kwargs):
+    """Имя автора выводится в ленте, но вход в систему её не меняет."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    """Новый или удалённый комментарий меняет страницу поста."""
+    if instance.post_id is not None:
+        bump_comments_version(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_choices(sender, **kwargs):
+    """Варианты выбора группы в формах строятся заново."""
+    bump_groups_version()
@@ -0,0 +1,21 @@
+from core.jobs import task
+
+from . import notifications, thumbnails
+
+
+@task('posts.generate_thumbnail')
+def generate_thumbnail(name, geometry, options):
+    """Создаёт миниатюру картинки поста."""
+    thumbnails.generate(name, geometry, options)
+
+
+@task('posts.notify_followers')
+def notify_followers(post_id):
+    """Создаёт уведомления о новом посте для подписчиков автора."""
+    notifications.fan_out(post_id)
+
+
+@task('posts.send_notifications')
+def send_notifications():
+    """Отправляет накопившиеся уведомления письмами."""
+    notifications.send_pending()
@@ -0,0 +1,16 @@
+from django import template
+
+from ..pagination import ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_range(page_obj):
+    """Номера страниц для навигации: окно вокруг текущей и края."""
+    return elided_page_range(page_obj)
+
+
+@register.filter
+def is_ellipsis(value):
+    return value == ELLIPSIS
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, size='feed'):
+    """Миниатюра картинки поста: готовая или заглушка на время создания."""
+    return thumbnails.post_thumbnail(image, size)
@@ -0,0 +1,63 @@
+# posts/tests/test_admin.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.posts = [
+            Post.objects.create(text=f'Тестовый текст {i}', author=cls.admin)
+            for i in range(8)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def get(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_unfiltered_list_is_estimated(self):
+        """Без фильтров записи не считаются COUNT(*)."""
+        self.posts[0].delete()
+        response, queries = self.get()
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+        # Оценка по наибольшему ключу не видит удалённую запись
+        self.assertEqual(response.context['cl'].result_count, 8)
+        self.assertFalse(response.context['cl'].show_full_result_count)
+
+    def test_filtered_count_is_bounded_and_cached(self):
+        """Большой отфильтрованный список считается один раз."""
+        params = {'author__id__exact': self.admin.pk}
+        response, queries = self.get(params)
+        self.assertEqual(response.context['cl'].result_count, 8)
+        self.assertTrue([sql for sql in queries if 'LIMIT 6' in sql])
+        response, queries = self.get(params)
+        self.assertEqual(response.context['cl'].result_count, 8)
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+
+    def test_date_hierarchy_is_cached(self):
+        """Даты иерархии берутся из кеша, пока посты не изменились."""
+        _, queries = self.get()
+        self.assertTrue([sql for sql in queries if 'DISTINCT' in sql])
+        _, queries = self.get()
+        self.assertFalse([sql for sql in queries if 'DISTINCT' in sql])
+        Post.objects.create(text='Новый пост', author=self.admin)
+        _, queries = self.get()
+        self.assertTrue([sql for sql in queries if 'DISTINCT' in sql])
@@ -0,0 +1,75 @@
+# posts/tests/test_counters.py
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.user = User.objects.create_user(username='TestUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Тестовый комментарий')
+        post.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.user).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.user).following_count, 0)
+
+    def test_pages_use_stored_counters(self):
+        """Число постов автора берётся из счётчиков, а не из COUNT."""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        # Профиль считает посты один раз - для постраничного вывода
+        count_budgets = {
+            reverse('posts:profile', kwargs={'username': self.author}): 1,
+            reverse('posts:post_detail', kwargs={'post_id': post.id}): 0,
+        }
+        for url, budget in count_budgets.items():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url)
+            with self.subTest(url=url):
+                self.assertEqual(response.context['posts_count'], 1)
+                self.assertEqual(len([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                ]), budget)
+
+    def test_reconcile_counters_command(self):
+        """Команда исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.user, text='Тестовый комментарий')
+        UserCounters.objects.filter(user=self.author).update(posts_count=5)
+        UserCounters.objects.filter(user=self.user).delete()
+        Post.objects.update(comments_count=0)
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
@@ -2,12 +2,17 @@ import shutil
 import tempfile
 from http import HTTPStatus
 
+from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ..forms import PostForm
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -169,3 +174,79 @@ class PostCreateFormTests(TestCase):
         # Проверяем, что создался коммент
         self.assertEqual(latest_comment.text, form_data['text'])
         self.assertEqual(latest_comment.author.username, form_data['author'])
+
+
+class GroupChoicesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(3)
+        ]
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        for group in cls.groups:
+            Post.objects.create(
+                text='Тестовый текст', author=cls.admin, group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def group_queries(self, render):
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        return [
+            query['sql'] for query in queries
+            if 'FROM "posts_group"' in query['sql']
+        ]
+
+    def test_choices_are_built_once(self):
+        """Варианты группы читаются из базы один раз на версию."""
+        self.assertTrue(self.group_queries(lambda: str(PostForm()['group'])))
+        self.assertEqual(
+            self.group_queries(lambda: str(PostForm()['group'])), [])
+        field = PostForm().fields['group']
+        self.assertEqual(type(field), forms.ModelChoiceField)
+        self.assertEqual(len(list(field.choices)), len(self.groups) + 1)
+
+    def test_group_change_refreshes_choices(self):
+        """Новая группа сразу появляется в вариантах."""
+        str(PostForm()['group'])
+        group = Group.objects.create(
+            title='Новая группа', slug='new', description='-')
+        self.assertIn(
+            'Новая группа',
+            str(PostForm(initial={'group': group.pk})['group'])
+        )
+        form = PostForm(data={'text': 'Текст', 'group': group.pk})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['group'], group)
+
+    def test_post_form_renders_only_selected_group(self):
+        """Форма поста выводит только выбранную группу, остальные
+           подгружаются подсказкой без запросов к базе."""
+        self.assertNotIn('Группа 1', str(PostForm()['group']))
+        self.assertIn(
+            'Группа 1',
+            str(PostForm(initial={'group': self.groups[1].pk})['group'])
+        )
+        client = Client()
+        url = reverse('posts:group_autocomplete')
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {'term': 'группа 2'})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.groups[2].pk, 'text': 'Группа 2'}]
+        })
+
+    def test_admin_changelist_does_not_query_groups_per_row(self):
+        """Поле группы в списке постов не запрашивает группы."""
+        client = Client()
+        client.force_login(self.admin)
+        url = reverse('admin:posts_post_changelist')
+        client.get(url)
+        response = client.get(url)
+        self.assertContains(response, 'Группа 1')
+        self.assertEqual(self.group_queries(lambda: client.get(url)), [])
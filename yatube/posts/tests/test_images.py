@@ -0,0 +1,98 @@
+# posts/tests/test_images.py
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post
+from ..thumbnails import placeholder_size
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        return Post.objects.create(
+            author=self.user, text='Тестовый текст', image=image)
+
+    def test_metadata_saved_on_upload(self):
+        """При загрузке сохраняются размеры, длина и хеш картинки."""
+        post = self.create_post(upload())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertEqual(len(post.image_hash), 64)
+
+    def test_duplicate_upload_reuses_file(self):
+        """Одинаковые картинки хранятся одним файлом."""
+        first = self.create_post(upload('first.gif'))
+        second = self.create_post(upload('second.gif'))
+        self.assertEqual(second.image.name, first.image.name)
+
+    def test_removing_image_clears_metadata(self):
+        """Без картинки сведения о ней сбрасываются."""
+        post = self.create_post(upload())
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_backfill_command(self):
+        """Команда заполняет сведения и убирает копии файлов."""
+        first = self.create_post(upload('first.gif'))
+        second = self.create_post(None)
+        # Копия, загруженная до появления хешей
+        copy = second.image.storage.save('posts/copy.gif', upload())
+        Post.objects.filter(pk=second.pk).update(image=copy)
+        Post.objects.update(image_hash='', image_width=None)
+        call_command(
+            'backfill_image_metadata', dedupe=True, stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image_width, 2)
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertFalse(second.image.storage.exists(copy))
+
+    def test_placeholder_size(self):
+        """Размер заглушки считается без чтения файла."""
+        crop = {'crop': 'center'}
+        self.assertEqual(placeholder_size('960x339', crop, 2, 1), (960, 339))
+        self.assertEqual(placeholder_size('960x339', {}, 2000, 1000),
+                         (678, 339))
+        self.assertEqual(
+            placeholder_size('960', {'upscale': False}, 200, 100), (200, 100))
+        self.assertEqual(placeholder_size('960x339', {}), (960, 339))
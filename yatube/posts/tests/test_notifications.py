@@ -0,0 +1,83 @@
+# posts/tests/test_notifications.py
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import jobs
+from core.models import Job
+
+from .. import notifications
+from ..models import Follow, Notification, Post
+
+User = get_user_model()
+
+
+class NotificationTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.followers = [
+            User.objects.create_user(
+                username=f'Follower{i}', email=f'follower{i}@example.com')
+            for i in range(2)
+        ]
+        # Без адреса писать некуда
+        silent = User.objects.create_user(username='Silent')
+        for user in self.followers + [silent]:
+            Follow.objects.create(user=user, author=self.author)
+
+    def publish(self, text='Тестовый текст'):
+        post = Post.objects.create(text=text, author=self.author)
+        # Раскладка по подписчикам; отправка отложена до конца окна
+        jobs.work(once=True)
+        return post
+
+    def test_post_create_only_enqueues(self):
+        """Публикация ставит задачу, а не отправляет письма."""
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:post_create'), data={'text': 'Пост'})
+        self.assertEqual(mail.outbox, [])
+        self.assertTrue(
+            Job.objects.filter(name='posts.notify_followers').exists())
+
+    def test_followers_are_notified_once(self):
+        """Письмо получают подписчики с адресом, текст рисуется раз."""
+        post = self.publish()
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertTrue(
+            Job.objects.filter(name='posts.send_notifications').exists())
+        with mock.patch.object(
+                notifications, 'render_message',
+                wraps=notifications.render_message) as render:
+            self.assertEqual(notifications.send_pending(), 2)
+        render.assert_called_once()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['follower0@example.com', 'follower1@example.com']
+        )
+        self.assertIn(
+            reverse('posts:post_detail', args=[post.pk]), mail.outbox[0].body)
+        self.assertEqual(notifications.send_pending(), 0)
+
+    def test_recent_recipients_get_digest(self):
+        """Посты, вышедшие после письма, приходят одним дайджестом."""
+        self.publish()
+        notifications.send_pending()
+        mail.outbox.clear()
+        self.publish('Второй пост')
+        self.publish('Третий пост')
+        self.assertEqual(notifications.send_pending(), 0)
+
+        Notification.objects.filter(sent__isnull=False).update(
+            sent=Notification.objects.first().created - timedelta(
+                seconds=settings.NOTIFICATION_DIGEST_INTERVAL + 1))
+        self.assertEqual(notifications.send_pending(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('Второй пост', mail.outbox[0].body)
+        self.assertIn('Третий пост', mail.outbox[0].body)
+        self.assertIn(': 2', mail.outbox[0].subject)
@@ -0,0 +1,92 @@
+# posts/tests/test_page_cache.py
+import math
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..feed_cache import get_comments_version, get_feed_version
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='username')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый текст'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def test_repeated_guest_request_is_served_from_cache(self):
+        """Повторный запрос гостя не обращается к базе."""
+        first = self.guest_client.get(self.url)
+        later = time.time() + 1
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch('posts.middleware.time.time', return_value=later):
+            second = self.guest_client.get(self.url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_request_returns_not_modified(self):
+        """Совпавший ETag даёт ответ 304 без тела."""
+        etag = self.guest_client.get(self.url)['ETag']
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_last_modified_is_sent_after_its_second(self):
+        """Last-Modified не отдаётся, пока в ту же секунду страница ещё
+           может измениться, и округляется вверх."""
+        version = max(get_feed_version(), get_comments_version(self.post.id))
+        with mock.patch('posts.middleware.time.time', return_value=version):
+            response = self.guest_client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        later = math.ceil(version)
+        with mock.patch('posts.middleware.time.time', return_value=later):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response['Last-Modified'], http_date(later))
+
+    def test_new_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        etag = self.guest_client.get(self.url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий')
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_follow_changes_profile_page(self):
+        """Подписка меняет счётчик и ETag в кешированном профиле."""
+        follower = User.objects.create_user(username='follower')
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        etag = self.guest_client.get(url)['ETag']
+        Follow.objects.create(user=follower, author=self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['counters'].followers_count, 1)
+
+    def test_authorized_user_is_not_cached(self):
+        """Авторизованный пользователь получает страницу без кеша."""
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(self.url)
+        self.assertNotIn('ETag', response)
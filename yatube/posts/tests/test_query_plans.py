@@ -0,0 +1,96 @@
+# posts/tests/test_query_plans.py
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Таблицы, запросы к которым проверяются
+CHECKED_TABLES = ('posts_',)
+# Полный проход по таблице без индекса
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы лент должны идти по индексам.
+
+    Для каждой страницы перехватываются SQL-запросы и для каждого
+    выполняется EXPLAIN QUERY PLAN: полный проход по таблице или
+    сортировка во временном B-дереве считаются регрессией.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.user = User.objects.create_user(username='TestUser')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый текст {i}'
+            )
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.user,
+                text='Тестовый комментарий'
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(
+                    table in sql for table in CHECKED_TABLES):
+                continue
+            for step in self.explain(sql):
+                match = FULL_SCAN.search(step)
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotIn(TEMP_SORT, step)
+                    self.assertFalse(
+                        match and match.group('table').startswith(
+                            CHECKED_TABLES),
+                        'Полный проход по таблице'
+                    )
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и страницы поста используют индексы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:profile', kwargs={'username': self.author})
+            + '?cursor=',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?cursor=',
+        )
+        for url in urls:
+            self.assert_indexed(url)
@@ -0,0 +1,90 @@
+# posts/tests/test_search.py
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..search import fts_query, search_posts
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(text=text, author=self.user)
+
+    def test_search_finds_words_and_prefixes(self):
+        """Находятся посты со всеми словами; последнее - по префиксу."""
+        post = self.create_post('Котики гуляют по крышам')
+        self.create_post('Собаки гуляют по парку')
+        self.assertEqual(list(search_posts('гуляют кот')), [post])
+        self.assertEqual(list(search_posts('КОТИКИ')), [post])
+        self.assertEqual(search_posts('гуляют').count(), 2)
+
+    def test_more_relevant_posts_come_first(self):
+        """Посты, где слово встречается чаще, идут выше."""
+        rare = self.create_post('Про котиков и прочее разное длинное')
+        often = self.create_post('котиков котиков котиков')
+        self.assertEqual(list(search_posts('котиков')), [often, rare])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Изменение и удаление поста сразу видны в поиске."""
+        post = self.create_post('Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertFalse(search_posts('старый').exists())
+        self.assertEqual(list(search_posts('новый')), [post])
+        post.delete()
+        self.assertFalse(search_posts('новый').exists())
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(fts_query('"кот" OR (NEAR'), '"кот" "OR" "NEAR"*')
+        self.assertEqual(fts_query('!!!'), '')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'кот" AND'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_page_is_paginated_by_cursor(self):
+        """Страница поиска листается по курсору с сохранением запроса."""
+        for i in range(settings.NUMBER_POSTS + 3):
+            self.create_post(f'Тестовый текст {i}')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'тестовый'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), settings.NUMBER_POSTS)
+        self.assertContains(response, 'q=%D1%82%D0%B5%D1%81%D1%82')
+        response = self.guest_client.get(
+            reverse('posts:search'),
+            {'q': 'тестовый', 'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу, а не через LIKE."""
+        self.create_post('Котики гуляют по крышам')
+        client = Client()
+        client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'котики'})
+        self.assertContains(response, 'Котики гуляют')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
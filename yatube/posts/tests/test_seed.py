@@ -0,0 +1,88 @@
+# posts/tests/test_seed.py
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SEED_OPTIONS = {
+    'users': 30,
+    'groups': 5,
+    'posts': 200,
+    'comments': 300,
+    'follows_per_user': 5,
+    'image_pool': 2,
+    'image_ratio': 0.5,
+    'batch_size': 50,
+    'stdout': StringIO(),
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedScaleTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_creates_requested_volumes(self):
+        """Команда создаёт заданные объёмы данных и всё к ним нужное."""
+        call_command('seed_scale', **SEED_OPTIONS)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        # Счётчики сходятся с таблицами
+        author = Post.objects.values('author').annotate(
+            count=Count('pk')).order_by('-count').first()
+        self.assertEqual(
+            User.objects.get(pk=author['author']).counters.posts_count,
+            author['count']
+        )
+        # Даты постов растут вместе с id
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_seeded_comments_page_through_fragments(self):
+        """Комментарии из команды - ветки, которые листаются курсором."""
+        call_command('seed_scale', **SEED_OPTIONS)
+        self.assertFalse(Comment.objects.filter(thread__isnull=True).exists())
+        post = Post.objects.annotate(count=Count('comments')).order_by(
+            '-count').first()
+        self.assertGreater(post.count, settings.COMMENTS_PER_PAGE)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        comments = list(response.context['comments'])
+        cursor = response.context['comments'].next_cursor
+        while cursor:
+            response = self.client.get(
+                reverse('posts:post_comments', kwargs={'post_id': post.id}),
+                {'cursor': cursor})
+            comments += list(response.context['comments'])
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(
+            comments, list(post.comments.order_by('path')))
+
+    def test_seed_is_deterministic(self):
+        """Одинаковый seed даёт одинаковые данные."""
+        call_command('seed_scale', prefix='a', **SEED_OPTIONS)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'))
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        call_command('seed_scale', prefix='a', **SEED_OPTIONS)
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'))
+        self.assertEqual(first, second)
@@ -0,0 +1,151 @@
+# posts/tests/test_threads.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentThreadsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='username')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый текст')
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Другой пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def comment(self, text, parent=None, post=None):
+        return Comment.objects.create(
+            post=post or self.post, author=self.user,
+            text=text, parent=parent)
+
+    def test_reply_path_extends_parent_path(self):
+        """Путь ответа начинается с пути родителя, ветка - с корня."""
+        root = self.comment('Корень')
+        reply = self.comment('Ответ', parent=root)
+        nested = self.comment('Ответ на ответ', parent=reply)
+        self.assertEqual(root.path, str(root.pk).zfill(Comment.PATH_STEP))
+        self.assertTrue(nested.path.startswith(reply.path))
+        self.assertEqual(
+            (root.depth, reply.depth, nested.depth), (0, 1, 2))
+        self.assertEqual({root.thread, reply.thread, nested.thread},
+                         {root.pk})
+
+    def test_subtree_is_depth_first_and_limited_to_branch(self):
+        """Ветка комментария - его ответы в порядке обхода дерева."""
+        root = self.comment('Корень')
+        first = self.comment('Первый ответ', parent=root)
+        second = self.comment('Второй ответ', parent=root)
+        nested = self.comment('Ответ на первый', parent=first)
+        self.comment('Другая ветка')
+        self.assertEqual(list(root.subtree()), [first, nested, second])
+        self.assertEqual(list(first.subtree()), [nested])
+
+    @override_settings(COMMENTS_MAX_DEPTH=2)
+    def test_too_deep_reply_attaches_to_last_level(self):
+        """Ответ глубже разрешённого становится ответом на последнем
+           уровне."""
+        parent = self.comment('Корень')
+        for _ in range(2):
+            parent = self.comment('Ответ', parent=parent)
+        reply = self.comment('Слишком глубоко', parent=parent)
+        self.assertEqual(reply.depth, 2)
+        self.assertEqual(reply.parent_id, parent.parent_id)
+
+    @override_settings(COMMENTS_REPLIES_PER_THREAD=2)
+    def test_post_page_shows_first_replies_of_each_thread(self):
+        """Под каждой веткой первые ответы; все ответы страницы читаются
+           одним запросом."""
+        roots = [self.comment(f'Ветка {i}') for i in range(3)]
+        first = self.comment('Ответ', parent=roots[0])
+        self.comment('Ответ на ответ', parent=first)
+        self.comment('Ещё ответ', parent=roots[0])
+        self.comment('Единственный ответ', parent=roots[1])
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as queries:
+            comments = self.client.get(url).context['comments']
+        self.assertEqual(list(comments), roots)
+        self.assertEqual(
+            [len(root.thread_replies) for root in comments], [2, 1, 0])
+        self.assertEqual(
+            [root.has_more_replies for root in comments],
+            [True, False, False]
+        )
+        self.assertEqual(
+            len([query for query in queries.captured_queries
+                 if 'posts_comment' in query['sql']]),
+            2
+        )
+
+    def test_add_comment_creates_reply(self):
+        """Комментарий с parent сохраняется ответом."""
+        root = self.comment('Корень')
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Ответ', 'parent': root.id}
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(list(root.subtree()), [reply])
+
+    def test_cannot_reply_to_comment_of_another_post(self):
+        """Ответить можно только на комментарий того же поста."""
+        foreign = self.comment('Чужой', post=self.other_post)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Ответ', 'parent': foreign.id}
+        )
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_reply_link_prefills_form(self):
+        """Ссылка «Ответить» подставляет комментарий в форму."""
+        root = self.comment('Корень')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            {'reply': root.id}
+        )
+        self.assertEqual(response.context['reply_to'], root)
+        self.assertContains(
+            response, f'name="parent" value="{root.id}"', html=False)
+
+    def test_thread_page_and_fragment(self):
+        """Ветка открывается страницей, а для скрипта - фрагментом
+           с ответами после показанных."""
+        root = self.comment('Корень')
+        replies = [
+            self.comment(f'Ответ {i}', parent=root)
+            for i in range(settings.COMMENTS_REPLIES_PER_THREAD + 2)
+        ]
+        url = reverse(
+            'posts:comment_thread',
+            kwargs={'post_id': self.post.id, 'comment_id': root.id}
+        )
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'base.html')
+        self.assertEqual(list(response.context['replies']), replies)
+
+        shown = replies[settings.COMMENTS_REPLIES_PER_THREAD - 1]
+        response = self.client.get(
+            url, {'after': shown.path}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['replies']),
+            replies[settings.COMMENTS_REPLIES_PER_THREAD:]
+        )
+
+    def test_deleting_comment_deletes_its_branch(self):
+        """Удаление комментария удаляет его ответы."""
+        root = self.comment('Корень')
+        self.comment('Ответ', parent=self.comment('Ответ', parent=root))
+        root.delete()
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,88 @@
+# posts/tests/test_thumbnails.py
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+
+from core import jobs
+from core.models import Job
+
+from ..models import Post
+from ..thumbnails import PLACEHOLDER, post_thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый текст',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            )
+        )
+
+    def test_missing_thumbnail_renders_placeholder(self):
+        """Пока миниатюры нет, вместо неё отдаётся заглушка."""
+        thumbnail = post_thumbnail(self.post.image)
+        self.assertFalse(thumbnail.ready)
+        self.assertEqual(thumbnail.url, static(PLACEHOLDER))
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    def test_command_generates_thumbnails(self):
+        """Команда создаёт миниатюры, и страницы берут готовые."""
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        thumbnail = post_thumbnail(self.post.image)
+        self.assertTrue(thumbnail.ready)
+        self.assertNotEqual(thumbnail.url, static(PLACEHOLDER))
+
+    def test_missing_thumbnail_is_queued_once(self):
+        """Недостающая миниатюра ставится в очередь один раз."""
+        post_thumbnail(self.post.image)
+        cache.clear()
+        post_thumbnail(self.post.image)
+        self.assertEqual(
+            Job.objects.filter(name='posts.generate_thumbnail').count(), 1)
+        jobs.work(once=True)
+        self.assertFalse(
+            Job.objects.filter(name='posts.generate_thumbnail').exists())
+        self.assertTrue(post_thumbnail(self.post.image).ready)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_inline_generation_without_workers(self):
+        """Без очереди миниатюра создаётся сразу."""
+        self.assertFalse(post_thumbnail(self.post.image).ready)
+        self.assertTrue(post_thumbnail(self.post.image).ready)
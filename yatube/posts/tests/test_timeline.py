@@ -0,0 +1,66 @@
+# posts/tests/test_timeline.py
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.user = User.objects.create_user(username='TestUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост автора записывается в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 1
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_on_request(self):
+        """Посты популярного автора не раскладываются,
+           но попадают в ленту при чтении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3)
+    def test_author_below_limit_keeps_posts_in_timelines(self):
+        """Когда отписка опускает автора ниже порога, его посты,
+           читавшиеся напрямую, остаются в лентах подписчиков."""
+        readers = [
+            User.objects.create_user(username=f'Reader{i}') for i in range(2)]
+        for user in (self.user, *readers):
+            Follow.objects.create(user=user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.get(user=readers[0], author=self.author).delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', flat=True)),
+            {self.user.pk, readers[1].pk}
+        )
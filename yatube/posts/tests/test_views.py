@@ -7,10 +7,16 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Follow, Group, Post
+from ..counters import recount
+from ..models import Comment, Follow, Group, Post
+from ..pagination import ELLIPSIS, elided_page_range
 
 User = get_user_model()
 
@@ -47,6 +53,8 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Гостям страницы отдаются из кеша целиком, без контекста
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -209,6 +217,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(cls.objects, cls.posts_count)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -242,6 +251,411 @@ class PaginatorViewsTest(TestCase):
             len(response.context['page_obj']), settings.NUMBER_POSTS)
 
 
+class ElidedPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='username')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text='Тестовый текст')
+            for _ in range(settings.NUMBER_POSTS * 30)
+        ])
+        # bulk_create обходит сигналы: пересчитываем счётчики автора
+        recount(cls.user.pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_range_is_windowed(self):
+        """Выводятся края и соседние страницы, остальное - пропуск."""
+        page = Paginator(range(1000), 1).page(500)
+        self.assertEqual(
+            elided_page_range(page),
+            [1, ELLIPSIS, 498, 499, 500, 501, 502, ELLIPSIS, 1000]
+        )
+        self.assertEqual(
+            elided_page_range(Paginator(range(1000), 1).page(2)),
+            [1, 2, 3, 4, ELLIPSIS, 1000]
+        )
+        self.assertEqual(
+            elided_page_range(Paginator(range(5), 1).page(3)),
+            [1, 2, 3, 4, 5]
+        )
+
+    def test_paginator_renders_bounded_links(self):
+        """Число ссылок не зависит от числа страниц."""
+        response = self.client.get(reverse('posts:index'), {'page': 15})
+        self.assertEqual(response.content.decode().count('?page='), 10)
+        self.assertContains(response, '?page=30')
+        self.assertNotContains(response, '?page=5"')
+
+    def test_count_is_cached_until_posts_change(self):
+        """COUNT выполняется один раз, пока посты не изменились."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+
+        def counts():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'page': 2})
+            self.assertEqual(response.status_code, 200)
+            return sum('COUNT(' in query['sql'] for query in queries)
+
+        self.assertEqual(counts(), 1)
+        self.assertEqual(counts(), 0)
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(counts(), 1)
+        self.assertEqual(
+            self.client.get(url).context['page_obj'].paginator.count,
+            settings.NUMBER_POSTS * 30 + 1
+        )
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='username'
+        )
+        cls.posts_count = 13
+        Post.objects.bulk_create([Post(
+            author=cls.user,
+            text=f'Тестовый текст {i}')
+            for i in range(cls.posts_count)
+        ])
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_page(self, cursor=''):
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'cursor': cursor}
+        )
+        return response.context['page_obj']
+
+    def test_cursor_pages_cover_feed_without_overlap(self):
+        """Проверка: курсорные страницы идут подряд и не пересекаются."""
+        first_page = self.get_page()
+        self.assertEqual(len(first_page), settings.NUMBER_POSTS)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        second_page = self.get_page(first_page.next_cursor)
+        self.assertEqual(len(second_page),
+                         self.posts_count % settings.NUMBER_POSTS)
+        self.assertFalse(second_page.has_next())
+        ids = [post.id for post in list(first_page) + list(second_page)]
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True))
+        )
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Проверка: ссылка «назад» возвращает предыдущую страницу."""
+        first_page = self.get_page()
+        second_page = self.get_page(first_page.next_cursor)
+        previous_page = self.get_page(second_page.previous_cursor)
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Проверка: повреждённый курсор открывает первую страницу."""
+        page = self.get_page('не-курсор')
+        self.assertEqual(list(page), list(self.get_page()))
+
+    def test_cursor_page_query_count_does_not_depend_on_depth(self):
+        """Проверка: глубокая страница стоит столько же запросов,
+           сколько первая."""
+        cursor = self.get_page().next_cursor
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        with CaptureQueriesContext(connection) as first_page:
+            self.authorized_client.get(url, {'cursor': ''})
+        with CaptureQueriesContext(connection) as deep_page:
+            self.authorized_client.get(url, {'cursor': cursor})
+        self.assertEqual(len(first_page), len(deep_page))
+        self.assertFalse(any(
+            'OFFSET' in query['sql'] for query in deep_page.captured_queries
+        ))
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='username')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.posts_count = settings.NUMBER_POSTS * 2 + 3
+        for i in range(cls.posts_count):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def scroll(self, page_url, fragment_url):
+        """Посты страницы и всех фрагментов, подгруженных следом."""
+        response = self.authorized_client.get(page_url)
+        posts = list(response.context['page_obj'])
+        cursor = response.context['next_cursor']()
+        while cursor:
+            response = self.authorized_client.get(
+                fragment_url, {'cursor': cursor})
+            self.assertTemplateNotUsed(response, 'base.html')
+            posts += list(response.context['page_obj'])
+            cursor = response.context['next_cursor']()
+        return posts
+
+    def test_fragments_continue_every_feed(self):
+        """Фрагменты продолжают каждую ленту без пропусков и повторов."""
+        Follow.objects.create(user=self.user, author=self.author)
+        feeds = (
+            ('posts:index', 'posts:index_fragment', ()),
+            ('posts:group_list', 'posts:group_list_fragment',
+             (self.group.slug,)),
+            ('posts:profile', 'posts:profile_fragment',
+             (self.author.username,)),
+            ('posts:follow_index', 'posts:follow_index_fragment', ()),
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for page, fragment, args in feeds:
+            with self.subTest(page=page):
+                self.assertEqual(
+                    self.scroll(reverse(page, args=args),
+                                reverse(fragment, args=args)),
+                    expected
+                )
+
+    def test_numbered_page_is_ordered_like_cursor(self):
+        """Номерная страница сортируется как курсор: посты с одинаковой
+           датой различает id, и фрагмент продолжает её без повторов."""
+        Post.objects.update(pub_date=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            posts = self.scroll(reverse('posts:index'),
+                                reverse('posts:index_fragment'))
+        self.assertEqual(
+            posts, list(Post.objects.order_by('-pub_date', '-id')))
+        self.assertTrue(all(
+            '"posts_post"."id" DESC' in query['sql']
+            for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+            and 'ORDER BY' in query['sql']
+        ))
+
+    def test_cached_page_does_not_query_posts(self):
+        """Страница из кеша шаблона не запрашивает посты ради курсора."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        self.assertEqual(
+            [query['sql'] for query in queries.captured_queries
+             if 'FROM "posts_post"' in query['sql']],
+            []
+        )
+
+    def test_page_links_to_fragment(self):
+        """Страница ленты ссылается на фрагмент со следующими постами."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'{reverse("posts:index_fragment")}'
+            f'?cursor={response.context["next_cursor"]()}'
+        )
+
+    def test_fragment_is_cached_until_feed_changes(self):
+        """Повторный фрагмент отдаётся из кеша, новый пост его сбрасывает."""
+        url = reverse('posts:group_list_fragment', args=[self.group.slug])
+
+        def post_queries():
+            with CaptureQueriesContext(connection) as queries:
+                content = self.authorized_client.get(url).content
+            return content, sum(
+                'posts_post' in query['sql']
+                for query in queries.captured_queries
+            )
+
+        content, queries = post_queries()
+        self.assertGreater(queries, 0)
+        self.assertEqual(post_queries(), (content, 0))
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        content, queries = post_queries()
+        self.assertGreater(queries, 0)
+        self.assertIn('Свежий пост', content.decode())
+
+    def test_follow_fragment_changes_with_subscriptions(self):
+        """Фрагмент ленты подписок обновляется после подписки."""
+        url = reverse('posts:follow_index_fragment')
+        response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            len(response.context['page_obj']), settings.NUMBER_POSTS)
+
+    def test_fragment_of_missing_feed_returns_404(self):
+        """Фрагмент несуществующей группы отдаёт 404."""
+        response = self.authorized_client.get(
+            reverse('posts:group_list_fragment', args=['no-such-group']))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='username')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый текст')
+        cls.comments_count = settings.COMMENTS_PER_PAGE + 5
+        # Путь ветки записывается в save, поэтому без bulk_create
+        for i in range(cls.comments_count):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def test_post_detail_shows_first_page_of_comments(self):
+        """Проверка: страница поста выводит одну страницу комментариев."""
+        comments = self.authorized_client.get(self.url).context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(
+            comments[0], Comment.objects.order_by('created', 'id').first())
+
+    def test_fragment_returns_next_page(self):
+        """Проверка: фрагмент отдаёт следующие комментарии без страницы."""
+        comments = self.authorized_client.get(self.url).context['comments']
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        next_comments = response.context['comments']
+        self.assertEqual(len(next_comments),
+                         self.comments_count - settings.COMMENTS_PER_PAGE)
+        self.assertFalse(next_comments.has_next())
+        self.assertFalse(set(comments) & set(next_comments))
+
+    def test_fragment_of_missing_post_returns_404(self):
+        """Проверка: фрагмент комментариев несуществующего поста - 404,
+           в том числе для гостя, чей ответ кешируется."""
+        url = reverse('posts:post_comments', kwargs={'post_id': 0})
+        self.assertEqual(self.authorized_client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_without_javascript_page_accepts_cursor(self):
+        """Проверка: без JavaScript следующая страница открывается
+           через параметр comments."""
+        cursor = self.authorized_client.get(
+            self.url).context['comments'].next_cursor
+        response = self.authorized_client.get(self.url, {'comments': cursor})
+        self.assertEqual(
+            len(response.context['comments']),
+            self.comments_count - settings.COMMENTS_PER_PAGE
+        )
+        self.assertContains(response, f'?comments={cursor}', count=0)
+
+    def test_first_page_is_cached_until_comments_change(self):
+        """Проверка: первая страница комментариев берётся из кеша,
+           пока не появится новый комментарий."""
+        def comment_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client.get(self.url)
+            return sum(
+                'posts_comment' in query['sql']
+                for query in queries.captured_queries
+            )
+
+        first_load = comment_queries()
+        self.assertGreater(first_load, 0)
+        self.assertEqual(comment_queries(), 0)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Новый комментарий'}
+        )
+        self.assertEqual(comment_queries(), first_load)
+
+
+class QueryBudgetTest(TestCase):
+    """Количество SQL-запросов страницы не зависит от числа постов.
+
+    Посты и комментарии создаются от разных авторов и в разных группах,
+    поэтому ленивая подгрузка связей в шаблоне сразу превысит бюджет.
+    """
+
+    # Запросы сессии и пользователя + запросы самой страницы
+    QUERY_BUDGETS = {
+        'posts:index': 4,
+        'posts:group_list': 5,
+        'posts:profile': 6,
+        'posts:post_detail': 5,
+        'posts:follow_index': 5,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='username')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        for i in range(settings.NUMBER_POSTS):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                description='Тестовое описание',
+                slug=f'group-{i}'
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            cls.post = Post.objects.create(
+                author=author,
+                group=cls.group if i % 2 else group,
+                text='Тестовый текст'
+            )
+            Comment.objects.create(
+                post=cls.post, author=author, text='Тестовый комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pages_stay_within_query_budget(self):
+        """Страницы укладываются в бюджет SQL-запросов."""
+        for i in range(settings.NUMBER_POSTS):
+            Comment.objects.create(
+                post=self.post,
+                author=User.objects.create_user(
+                    username=f'commentator{i}'),
+                text='Тестовый комментарий'
+            )
+        kwargs = {
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.post.author},
+            'posts:post_detail': {'post_id': self.post.id},
+        }
+        for name, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                url = reverse(name, kwargs=kwargs.get(name))
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertLessEqual(len(queries), budget)
+
+
 class CashTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -251,21 +665,48 @@ class CashTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_cache_index_page(self):
         """Проверка работы кеша."""
-        cache1 = self.guest_client.get(reverse('posts:index')).content
         Post.objects.create(
             text='Cash text',
             author=self.user
         )
-        cache2 = self.guest_client.get(reverse('posts:index')).content
+        cache1 = self.guest_client.get(reverse('posts:index')).content
+        # Повторный запрос не читает посты из базы
+        with CaptureQueriesContext(connection) as queries:
+            cache2 = self.guest_client.get(reverse('posts:index')).content
         self.assertEqual(cache1, cache2)
-        cache.clear()
-        self.assertNotEqual(
-            cache2, self.guest_client.get(reverse('posts:index')).content
+        self.assertFalse(any(
+            'LIMIT' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_new_post_invalidates_index_cache(self):
+        """Новый пост сразу появляется на закешированной главной."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(
+            text='Cash text',
+            author=self.user
         )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Cash text')
+
+    def test_index_cache_varies_by_page_and_audience(self):
+        """Страницы и гости с пользователями кешируются отдельно."""
+        Post.objects.bulk_create([
+            Post(text=f'Cash text {i}', author=self.user)
+            for i in range(settings.NUMBER_POSTS + 1)
+        ])
+        first_page = self.guest_client.get(reverse('posts:index')).content
+        second_page = self.guest_client.get(
+            reverse('posts:index') + '?page=2').content
+        self.assertNotEqual(first_page, second_page)
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:follow_index'))
 
 
 class FollowTest(TestCase):
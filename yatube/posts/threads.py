@@ -0,0 +1,43 @@
+from operator import attrgetter
+
+from .models import Comment
+
+# Первые ответы каждой ветки в порядке обхода дерева. Нумерация идёт
+# в порядке индекса (post, thread, path) и не требует сортировки
+FIRST_REPLIES = (
+    'SELECT * FROM ('
+    'SELECT *, ROW_NUMBER() OVER ('
+    'PARTITION BY thread ORDER BY path) AS position '
+    f'FROM {Comment._meta.db_table} '
+    'WHERE post_id = %s AND thread BETWEEN %s AND %s AND depth > 0'
+    ') WHERE position <= %s'
+)
+
+
+def attach_replies(post_id, roots, limit):
+    """Загружает веткам roots их первые limit ответов.
+
+    Ветки страницы идут подряд, поэтому все их ответы лежат в одном
+    диапазоне индекса (post, thread, path) и читаются одним запросом.
+    Каждая ветка получает список thread_replies и флаг
+    has_more_replies. Возвращает roots.
+    """
+    for root in roots:
+        root.thread_replies = []
+        root.has_more_replies = False
+    if not roots:
+        return roots
+    # Лишний ответ показывает, что в ветке есть ещё
+    params = (post_id, roots[0].thread, roots[-1].thread, limit + 1)
+    replies = Comment.objects.raw(FIRST_REPLIES, params).prefetch_related(
+        'author')
+    # Ответов не больше (limit + 1) на ветку: упорядочить их здесь
+    # дешевле, чем сортировать результат окна в базе
+    threads = {root.thread: root for root in roots}
+    for reply in sorted(replies, key=attrgetter('path')):
+        root = threads[reply.thread]
+        if len(root.thread_replies) < limit:
+            root.thread_replies.append(reply)
+        else:
+            root.has_more_replies = True
+    return roots
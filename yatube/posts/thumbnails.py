@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.templatetags.static import static
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import jobs
+from core.timing import measure
+
+Thumbnail = namedtuple('Thumbnail', ('url', 'width', 'height', 'ready'))
+
+PLACEHOLDER = 'img/placeholder.svg'
+
+# Сколько секунд повторная постановка той же миниатюры пропускается
+SCHEDULE_TIMEOUT = 60
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет только искать готовую миниатюру."""
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из хранилища ключей sorl или None, без генерации.
+
+        Имя файла миниатюры вычисляется так же, как в get_thumbnail,
+        поэтому найденная запись совпадает с той, что создаст воркер.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = CachedThumbnailBackend()
+
+
+def generate(name, geometry, options):
+    """Создаёт миниатюру."""
+    get_thumbnail(name, geometry, **options)
+    return name, geometry
+
+
+def schedule(name, geometry, options):
+    """Ставит создание миниатюры в очередь задач.
+
+    Страница с ещё не готовой миниатюрой может открываться много раз,
+    пока задача ждёт воркера; общий кеш не даёт каждый раз обращаться
+    к таблице задач.
+    """
+    key = f'thumbnail:{name}:{geometry}'
+    if not cache.add(f'posts:{key}', True, SCHEDULE_TIMEOUT):
+        return
+    jobs.enqueue(
+        'posts.generate_thumbnail',
+        {'name': name, 'geometry': geometry, 'options': dict(options)},
+        key=key
+    )
+
+
+def schedule_post_thumbnails(post):
+    """Ставит в очередь все размеры миниатюр для картинки поста."""
+    if not post.image:
+        return
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        schedule(post.image.name, geometry, options)
+
+
+def post_thumbnail(image, size='feed'):
+    """Готовая миниатюра или заглушка того же размера.
+
+    Отсутствующая миниатюра не создаётся во время отрисовки страницы,
+    а ставится в очередь задач.
+    """
+    with measure('thumbnail'):
+        geometry, options = settings.POST_THUMBNAILS[size]
+        thumbnail = backend.get_cached_thumbnail(
+            image.name, geometry, **options)
+        if thumbnail:
+            return Thumbnail(
+                thumbnail.url, thumbnail.width, thumbnail.height, True)
+        schedule(image.name, geometry, options)
+    post = getattr(image, 'instance', None)
+    width, height = placeholder_size(
+        geometry, options,
+        getattr(post, 'image_width', None),
+        getattr(post, 'image_height', None)
+    )
+    return Thumbnail(static(PLACEHOLDER), width, height, False)
+
+
+def placeholder_size(geometry, options, width=None, height=None):
+    """Размер будущей миниатюры по геометрии и размерам оригинала.
+
+    Размеры оригинала хранятся в посте, так что файл не открывается.
+    Если они неизвестны, берётся размер из геометрии.
+    """
+    box_width, _, box_height = geometry.partition('x')
+    box_width = int(box_width) if box_width else None
+    box_height = int(box_height) if box_height else None
+    if options.get('crop') or not (width and height):
+        return box_width or box_height, box_height or box_width
+    ratios = [
+        box / side
+        for box, side in ((box_width, width), (box_height, height))
+        if box
+    ]
+    ratio = min(ratios)
+    if not options.get('upscale', sorl_settings.THUMBNAIL_UPSCALE):
+        ratio = min(ratio, 1)
+    return max(round(width * ratio), 1), max(round(height * ratio), 1)
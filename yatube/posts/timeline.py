@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+# Размер пачки для bulk_create при раскладке по подписчикам
+FANOUT_BATCH_SIZE = 1000
+
+
+def followers_count(author_id):
+    followers = (
+        UserCounters.objects.filter(user_id=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    )
+    if followers is None:
+        followers = Follow.objects.filter(author_id=author_id).count()
+    return followers
+
+
+def is_fanout_author(author_id):
+    """Раскладывать ли посты автора по лентам при записи.
+
+    Посты авторов с огромным числом подписчиков не копируются
+    в ленты, а подмешиваются при чтении.
+    """
+    return followers_count(author_id) < settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    batch = []
+    for user_id in followers:
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        ))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними постами автора после подписки."""
+    if not is_fanout_author(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for post_id, pub_date in posts
+    ], ignore_conflicts=True)
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков,
+    когда их становится меньше TIMELINE_FANOUT_LIMIT.
+
+    Пока подписчиков было больше, посты автора читались напрямую
+    и в ленты не попадали; после отписки, опустившей автора ниже
+    порога, лента читает только TimelineEntry.
+    """
+    if followers_count(author_id) != settings.TIMELINE_FANOUT_LIMIT - 1:
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    followers = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    batch = []
+    for user_id in followers:
+        batch += [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ]
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя.
+
+    Основная часть берётся из материализованной ленты, посты авторов
+    без раскладки читаются напрямую (fan-out-on-read).
+    """
+    read_authors = list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gte=(
+                settings.TIMELINE_FANOUT_LIMIT)
+        ).values_list('author', flat=True)
+    )
+    if not read_authors:
+        # Сортировка по полям самой ленты идёт по её индексу
+        return (
+            Post.objects.filter(timeline_entries__user=user)
+            .annotate(
+                feed_date=F('timeline_entries__pub_date'),
+                feed_id=F('timeline_entries__post_id')
+            )
+            .order_by('-feed_date', '-feed_id')
+        )
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=read_authors)
+    ).order_by('-pub_date', '-id')
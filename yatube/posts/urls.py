@@ -7,11 +7,34 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    # Фрагменты лент для бесконечной прокрутки: только посты по курсору
+    path('more/', views.index_fragment, name='index_fragment'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/more/',
+        views.group_posts_fragment,
+        name='group_list_fragment'
+    ),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/more/',
+        views.profile_fragment,
+        name='profile_fragment'
+    ),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Фрагмент со следующей страницей комментариев
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/',
+        views.comment_thread,
+        name='comment_thread'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -19,7 +42,19 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('search/', views.search, name='search'),
+    # Группы для поля группы в форме поста, по мере ввода
+    path(
+        'groups/autocomplete/',
+        views.group_autocomplete,
+        name='group_autocomplete'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'follow/more/',
+        views.follow_index_fragment,
+        name='follow_index_fragment'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
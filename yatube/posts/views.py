@@ -1,30 +1,154 @@
 # posts/views.py
+import hashlib
+from functools import partial
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.vary import vary_on_headers
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-
+from core.db import primary_after_change, read_your_writes
 
-def paginator_context(queryset, request):
-    # Показывать по 10 записей на странице.
-    paginator = Paginator(queryset, settings.NUMBER_POSTS)
+from .counters import for_user
+from .feed_cache import (get_comments_version, get_feed_version,
+                         get_timeline_version)
+from .forms import CommentForm, PostForm
+from .group_choices import search_groups
+from .models import Comment, Follow, Group, Post, User
+from .pagination import (CachedCountPaginator, CursorPage, CursorPaginator,
+                         next_cursor)
+from .search import search_posts
+from .threads import attach_replies
+from .thumbnails import schedule_post_thumbnails
+from .timeline import timeline_posts
+
+
+def paginator_context(queryset, request, count_version=None):
+    # Курсорный режим: ?cursor=... или POSTS_PAGINATION = 'cursor'
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(queryset, settings.NUMBER_POSTS)
+        page_obj = paginator.get_page(cursor)
+        return {
+            'page_obj': page_obj,
+            'next_cursor': partial(next_cursor, page_obj)
+        }
+    # Показывать по 10 записей на странице. Число постов берётся
+    # из кеша, пока версия лент не изменилась
+    paginator = CachedCountPaginator(
+        queryset, settings.NUMBER_POSTS, version=count_version)
     # Из URL извлекаем номер запрошенной страницы - это значение параметра page
     page_number = request.GET.get('page')
     # Получаем набор записей для страницы с запрошенным номером
     page_obj = paginator.get_page(page_number)
     return {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        # С последнего поста страницы продолжается прокрутка. Курсор
+        # вычисляет шаблон внутри кешированного фрагмента: при попадании
+        # в кеш посты страницы не запрашиваются
+        'next_cursor': partial(next_cursor, page_obj)
     }
 
 
+FEED_FRAGMENT_KEY = 'posts:feed_fragment:{digest}'
+
+
+def feed_fragment(request, get_posts, versions, private=False):
+    """Посты ленты после ?cursor= без обёртки страницы.
+
+    Готовый HTML хранится в кеше по адресу, курсору и версиям данных
+    ленты, поэтому прокрутка не обращается к базе, пока лента
+    не изменилась. get_posts вызывается только при промахе кеша.
+    Фрагмент private ленты кешируется для каждого пользователя.
+    """
+    cursor = request.GET.get('cursor', '')
+    owner = request.user.pk if private else None
+    key = FEED_FRAGMENT_KEY.format(digest=hashlib.md5(
+        f'{request.path}:{cursor}:{owner}:{versions}'.encode()).hexdigest())
+    content = cache.get(key)
+    if content is None:
+        with primary_after_change(*versions):
+            paginator = CursorPaginator(get_posts(), settings.NUMBER_POSTS)
+            page_obj = paginator.get_page(cursor)
+            context = {
+                'page_obj': page_obj,
+                'next_cursor': partial(next_cursor, page_obj),
+                'fragment_url': request.path
+            }
+            content = render_to_string(
+                'posts/includes/feed_page.html', context, request)
+        cache.set(key, content, settings.FEED_CACHE_TIMEOUT)
+    return HttpResponse(content)
+
+
+COMMENTS_PAGE_KEY = 'posts:comments_page:{post_id}:{version}'
+
+
+def comments_page(post_id, cursor=None):
+    """Страница веток комментариев поста по курсору, от старых к новым.
+
+    Страница - комментарии верхнего уровня, у каждого первые
+    COMMENTS_REPLIES_PER_THREAD ответов. Первая страница хранится
+    в кеше, пока комментарии поста не изменятся, поэтому стоимость
+    страницы поста не зависит от числа комментариев.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id, depth=0)
+        .select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('path',)
+    )
+    if cursor:
+        page = paginator.get_page(cursor)
+        attach_replies(
+            post_id, page.object_list, settings.COMMENTS_REPLIES_PER_THREAD)
+        return page
+    version = get_comments_version(post_id)
+    key = COMMENTS_PAGE_KEY.format(post_id=post_id, version=version)
+    cached = cache.get(key)
+    if cached is None:
+        # Страница попадёт в общий кеш: после изменения не из реплики
+        with primary_after_change(version):
+            page = paginator.get_page()
+            attach_replies(
+                post_id, page.object_list,
+                settings.COMMENTS_REPLIES_PER_THREAD)
+        cache.set(
+            key, (page.object_list, page.has_next()),
+            settings.FEED_CACHE_TIMEOUT
+        )
+        return page
+    comments, has_next = cached
+    return CursorPage(comments, paginator, False, has_next)
+
+
 def index(request):
     """Выводит шаблон главной страницы."""
     template = 'posts/index.html'
-    context = paginator_context(Post.objects.all(), request)
-    return render(request, template, context)
+    posts = Post.objects.select_related('author', 'group')
+    feed_version = get_feed_version()
+    context = {
+        'feed_version': feed_version,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'fragment_url': reverse('posts:index_fragment')
+    }
+    # Страница и число постов попадают в общий кеш под версией лент
+    with primary_after_change(feed_version):
+        context.update(paginator_context(posts, request, feed_version))
+        return render(request, template, context)
+
+
+def index_fragment(request):
+    """Следующие посты главной для бесконечной прокрутки."""
+    return feed_fragment(
+        request,
+        lambda: Post.objects.select_related('author', 'group'),
+        (get_feed_version(),)
+    )
 
 
 def group_posts(request, slug):
@@ -33,51 +157,156 @@ def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
 
     context = {
-        'group': group
+        'group': group,
+        'fragment_url': reverse('posts:group_list_fragment', args=[slug])
     }
 
-    context.update(paginator_context(group.posts.all(), request))
-    return render(request, template, context)
+    posts = group.posts.select_related('author', 'group')
+    feed_version = get_feed_version()
+    with primary_after_change(feed_version):
+        context.update(paginator_context(posts, request, feed_version))
+        return render(request, template, context)
+
+
+def group_posts_fragment(request, slug):
+    """Следующие посты группы для бесконечной прокрутки."""
+    return feed_fragment(
+        request,
+        lambda: get_object_or_404(Group, slug=slug).posts
+        .select_related('author', 'group'),
+        (get_feed_version(),)
+    )
 
 
 def profile(request, username):
     """Выводит шаблон профа1ла пользователя"""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts_count = author.posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    counters = for_user(author)
     # Проверяем подписку
     following = request.user.is_authenticated and (
         Follow.objects.filter(user=request.user, author=author).exists())
 
     context = {
         'author': author,
-        'posts_count': posts_count,
-        'following': following
+        'posts_count': counters.posts_count,
+        'counters': counters,
+        'following': following,
+        'fragment_url': reverse('posts:profile_fragment', args=[username])
     }
 
-    context.update(paginator_context(author.posts.all(), request))
-    return render(request, template, context)
+    posts = author.posts.select_related('author', 'group')
+    feed_version = get_feed_version()
+    with primary_after_change(feed_version):
+        context.update(paginator_context(posts, request, feed_version))
+        return render(request, template, context)
+
+
+def profile_fragment(request, username):
+    """Следующие посты автора для бесконечной прокрутки."""
+    return feed_fragment(
+        request,
+        lambda: get_object_or_404(User, username=username).posts
+        .select_related('author', 'group'),
+        (get_feed_version(),)
+    )
 
 
 def post_detail(request, post_id):
     """Выводит детальное описание поста и сам пост"""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    posts_count = for_user(post.author).posts_count
+    # Ссылка «Ответить» открывает страницу с ?reply=<id комментария>
+    reply_to = None
+    if request.GET.get('reply', '').isdigit():
+        reply_to = (
+            post.comments.select_related('author')
+            .filter(pk=request.GET['reply']).first()
+        )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    # Без JavaScript «Показать ещё» открывает страницу с ?comments=
+    comments = comments_page(post.pk, request.GET.get('comments'))
 
     context = {
         'post': post,
         'posts_count': posts_count,
         'form': form,
+        'reply_to': reply_to,
         'comments': comments
     }
 
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев: фрагмент без обёртки страницы."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request.GET.get('cursor'))
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@vary_on_headers('X-Requested-With')
+def comment_thread(request, post_id, comment_id):
+    """Ветка ответов комментария целиком, одним диапазоном пути.
+
+    fragments.js получает только ответы после уже показанных (?after=),
+    без обёртки страницы.
+    """
+    comment = get_object_or_404(
+        Comment.objects.select_related('author'),
+        pk=comment_id,
+        post_id=post_id
+    )
+    replies = comment.subtree().select_related('author')
+    if request.GET.get('after'):
+        replies = replies.filter(path__gt=request.GET['after'])
+    context = {
+        'post_id': post_id,
+        'comment': comment,
+        'replies': replies
+    }
+    if request.is_ajax():
+        return render(request, 'posts/includes/replies.html', context)
+    return render(request, 'posts/comment_thread.html', context)
+
+
+def search(request):
+    """Полнотекстовый поиск по постам."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query).select_related('author', 'group')
+    # Результаты отсортированы по релевантности: листаем по курсору
+    paginator = CursorPaginator(posts, settings.NUMBER_POSTS)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('cursor'))
+    }
+    return render(request, template, context)
+
+
+def group_autocomplete(request):
+    """Группы с ?term= в названии для поля группы в форме поста.
+
+    Ищет по закешированному списку групп, без запросов к базе.
+    """
+    groups = search_groups(
+        request.GET.get('term', ''), settings.GROUP_AUTOCOMPLETE_LIMIT)
+    return JsonResponse({
+        'results': [{'id': pk, 'text': title} for pk, title in groups]
+    })
+
+
 @login_required
+@read_your_writes
 def post_create(request):
     """Выводит шаблон создания постов."""
     template = 'posts/create_post.html'
@@ -88,11 +317,14 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    # Миниатюры создаются в фоне, а не при первом показе ленты
+    schedule_post_thumbnails(post)
 
     return redirect('posts:profile', request.user)
 
 
 @login_required
+@read_your_writes
 def post_edit(request, post_id):
     """Выводит шаблон редактирования поста."""
     template = 'posts/create_post.html'
@@ -107,6 +339,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_post_thumbnails(post)
         return redirect('posts:post_detail', post_id)
 
     context = {
@@ -118,6 +352,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@read_your_writes
 def add_comment(request, post_id):
     """Выводит форму для комментария."""
     post = get_object_or_404(Post, pk=post_id)
@@ -127,6 +362,10 @@ def add_comment(request, post_id):
         # Получаем автора комментария
         comment.author = request.user
         comment.post = post
+        # Ответить можно только на комментарий того же поста
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            comment.parent = get_object_or_404(post.comments, pk=parent_id)
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
@@ -135,15 +374,31 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Посты авторов, на которых подписан текущий пользователь."""
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = timeline_posts(request.user).select_related('author', 'group')
     context = {
-        'posts': posts
+        'posts': posts,
+        'fragment_url': reverse('posts:follow_index_fragment')
     }
+    # Лента меняется и от подписок, которые не сдвигают версию лент,
+    # поэтому её число постов не кешируется
     context.update(paginator_context(posts, request))
     return render(request, template, context)
 
 
 @login_required
+def follow_index_fragment(request):
+    """Следующие посты ленты подписок для бесконечной прокрутки."""
+    user = request.user
+    return feed_fragment(
+        request,
+        lambda: timeline_posts(user).select_related('author', 'group'),
+        (get_feed_version(), get_timeline_version(user.pk)),
+        private=True
+    )
+
+
+@login_required
+@read_your_writes
 def profile_follow(request, username):
     """Подписка на автора."""
     author = get_object_or_404(User, username=username)
@@ -156,6 +411,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@read_your_writes
 def profile_unfollow(request, username):
     """Отписка от автора."""
     author = get_object_or_404(User, username=username)
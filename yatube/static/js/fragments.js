@@ -0,0 +1,55 @@
+// Подгрузка фрагментов страницы. Ссылка с data-fragment="<адрес>"
+// заменяет ближайший контейнер data-fragment-target ответом сервера;
+// без JavaScript ссылка открывает обычную страницу. Ссылки
+// с data-autoload срабатывают сами, когда доходят до экрана, -
+// так устроена бесконечная прокрутка лент.
+(function () {
+  var observer = null;
+  if ('IntersectionObserver' in window) {
+    observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          entry.target.click();
+        }
+      });
+    }, {rootMargin: '400px'});
+  }
+
+  function watch() {
+    if (!observer) {
+      return;
+    }
+    document.querySelectorAll('a[data-fragment][data-autoload]')
+      .forEach(function (link) {
+        observer.observe(link);
+      });
+  }
+
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('a[data-fragment]');
+    if (!link) {
+      return;
+    }
+    event.preventDefault();
+    fetch(link.dataset.fragment, {
+      credentials: 'same-origin',
+      headers: {'X-Requested-With': 'XMLHttpRequest'}
+    })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        link.closest('[data-fragment-target]').outerHTML = html;
+        watch();
+      })
+      .catch(function () {
+        window.location = link.href;
+      });
+  });
+
+  watch();
+})();
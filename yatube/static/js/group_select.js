@@ -0,0 +1,46 @@
+// Поле группы в форме поста: select[data-autocomplete] содержит только
+// выбранную группу, остальные подгружаются по тексту из поля поиска
+// перед ним. Выбранная группа остаётся в списке при новом поиске.
+(function () {
+  function load(select, term) {
+    var url = select.dataset.autocomplete + '?term=' + encodeURIComponent(term);
+    fetch(url, {credentials: 'same-origin'})
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.json();
+      })
+      .then(function (data) {
+        var selected = select.value;
+        Array.prototype.slice.call(select.options).forEach(function (option) {
+          if (option.value && option.value !== selected) {
+            option.remove();
+          }
+        });
+        data.results.forEach(function (group) {
+          if (String(group.id) !== selected) {
+            select.add(new Option(group.text, group.id));
+          }
+        });
+      })
+      .catch(function () {});
+  }
+
+  document.querySelectorAll('select[data-autocomplete]')
+    .forEach(function (select) {
+      var search = document.createElement('input');
+      var timer = null;
+      search.type = 'search';
+      search.className = 'form-control mb-2';
+      search.placeholder = 'Найти группу';
+      select.parentNode.insertBefore(search, select);
+      search.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+          load(select, search.value);
+        }, 250);
+      });
+      load(select, '');
+    });
+})();
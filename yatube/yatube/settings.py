@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -41,7 +45,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
@@ -50,16 +53,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в замер попало время всех остальных слоёв
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # После сессий: закреплённая сессия читает из основной базы
+    'core.middleware.ReplicaReadsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
 ]
 
+# Панель отладки нужна только при разработке
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('posts.middleware.AnonymousPageCacheMiddleware'),
+        'debug_toolbar.middleware.DebugToolbarMiddleware'
+    )
+
 ROOT_URLCONF = 'yatube.urls'
 
 # IP адрес, при обращении к которым будет доступен DjDT
@@ -94,18 +109,79 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+DATABASE_PATH = os.path.join(BASE_DIR, 'db.sqlite3')
+# Отдельный файл реплики, который обновляет manage.py replicate_db.
+# Без него реплика - основной файл, открытый только для чтения
+DATABASE_REPLICA_PATH = os.getenv('DATABASE_REPLICA_PATH') or DATABASE_PATH
+
+# Соединения живут CONN_MAX_AGE секунд и не открываются на каждый запрос.
+# Писатель ждёт блокировку до timeout секунд, а не падает сразу
+# с «database is locked». Из реплики идут чтения постов
+# в GET-запросах.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'NAME': DATABASE_PATH,
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{DATABASE_REPLICA_PATH}?mode=ro',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'uri': True,
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+DATABASE_REPLICA_ALIAS = 'replica'
+# Приложения, чтения моделей которых идут в реплику
+DATABASE_REPLICA_APPS = ('posts',)
+# Сколько секунд после записи сессия читает из основной базы;
+# должно быть больше задержки репликации
+DATABASE_REPLICA_PIN_SECONDS = 15
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# Прагмы каждого соединения с SQLite. WAL позволяет читать во время
+# записи; busy_timeout (мс) - ждать блокировку вместо ошибки.
+# cache_size в минус килобайтах, mmap_size в байтах.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
-# Подключение бэкенд кеширования
+# Подключение бэкенд кеширования: файл SQLite, общий для всех процессов.
+# Локальная копия в процессе живёт LOCAL_TIMEOUT секунд и сбрасывается
+# по шине инвалидаций, которая опрашивается раз в POLL_INTERVAL секунд.
+CACHE_PATH = os.getenv('CACHE_PATH') or os.path.join(BASE_DIR, 'cache.sqlite3')
+# Тесты очищают кеш в setUp: каждый запуск получает свой файл во
+# временном каталоге, чтобы не стирать кеш сайта и не зависеть
+# от записей, оставшихся от прошлых запусков
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+    CACHE_PATH = os.path.join(CACHE_DIR, 'cache.sqlite3')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'LOCAL_TIMEOUT': 60,
+            'POLL_INTERVAL': 0.5,
+        },
     }
 }
 
@@ -162,14 +238,131 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # Указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+DEFAULT_FROM_EMAIL = 'noreply@nastya.pythonanywhere.com'
+# Адрес сайта для ссылок в письмах
+SITE_URL = 'https://nastya.pythonanywhere.com'
+
+# Письма подписчикам о новых постах. Уведомления создаются пачками
+# по NOTIFICATION_CHUNK_SIZE подписчиков и отправляются раз
+# в NOTIFICATION_SEND_DELAY секунд; пользователь получает не больше
+# одного письма за NOTIFICATION_DIGEST_INTERVAL секунд, остальные посты
+# приходят следующим письмом-дайджестом.
+NOTIFICATION_CHUNK_SIZE = 1000
+NOTIFICATION_SEND_DELAY = 60
+NOTIFICATION_DIGEST_INTERVAL = 60 * 60
 
 
 # Количество отображаемых постов
 NUMBER_POSTS = 10
 
+# Вариантов в подсказке группы в форме поста
+GROUP_AUTOCOMPLETE_LIMIT = 20
+
+# Режим пагинации лент: 'offset' (номера страниц) или 'cursor' (по ключу
+# сортировки, без COUNT и OFFSET). Курсор в ?cursor= включает его всегда.
+POSTS_PAGINATION = 'offset'
+
+# Лента подписок: посты авторов, у которых меньше TIMELINE_FANOUT_LIMIT
+# подписчиков, раскладываются по лентам при публикации, остальные
+# подмешиваются при чтении. При подписке в ленту добавляются
+# последние TIMELINE_BACKFILL_SIZE постов автора.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL_SIZE = 500
+
+# Комментариев на странице поста; следующие подгружаются по кнопке
+COMMENTS_PER_PAGE = 20
+# Ответов, которые показываются под каждой веткой сразу
+COMMENTS_REPLIES_PER_THREAD = 3
+# Глубина вложенности ответов; путь вмещает не больше 24 уровней
+COMMENTS_MAX_DEPTH = 5
+
+# Время жизни закешированной ленты. Свежесть обеспечивает версия,
+# которая меняется при каждом изменении постов, групп и авторов.
+FEED_CACHE_TIMEOUT = 60 * 15
+
+# Сколько секунд хранится число постов ленты для постраничного вывода;
+# при изменении постов оно устаревает сразу (вместе с версией лент)
+PAGINATOR_COUNT_TIMEOUT = 60 * 15
+
+# Списки админки: до ADMIN_EXACT_COUNT_LIMIT записей считаются точно,
+# больше - оцениваются или берутся из кеша на ADMIN_COUNT_CACHE_TIMEOUT
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_COUNT_CACHE_TIMEOUT = 60 * 5
+
+# Время жизни страниц, закешированных целиком для гостей
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 15
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Размеры миниатюр картинок постов: имя -> (геометрия, опции sorl)
+POST_THUMBNAILS = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Фоновая очередь задач (core.jobs), воркеры: manage.py run_workers.
+# Без запущенных воркеров задачи только копятся: миниатюры картинок
+# не создаются (на их месте заглушки), письма подписчикам не уходят.
+# JOBS_EAGER выполняет задачи сразу, без очереди и воркеров, - удобно
+# для runserver при разработке.
+# Неудачная задача повторяется через JOBS_RETRY_DELAY секунд, пауза
+# удваивается с каждой попыткой; задача, которую воркер держит дольше
+# JOBS_LOCK_TIMEOUT секунд, выдаётся снова.
+JOBS_WORKERS = 2
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_LOCK_TIMEOUT = 600
+JOBS_POLL_INTERVAL = 1
+
+# Метрики времени ответа: процессы сбрасывают гистограммы в общий кеш
+# раз в METRICS_FLUSH_INTERVAL секунд; данные процесса, который молчит
+# дольше METRICS_TIMEOUT, пропадают со страницы /metrics/. Страница
+# собирает не больше METRICS_WORKER_SLOTS процессов.
+# Сборщик метрик передаёт METRICS_TOKEN в заголовке Authorization.
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TIMEOUT = 60 * 60
+METRICS_WORKER_SLOTS = 64
+METRICS_TOKEN = ''
+
+# Профили cProfile: запросы сотрудников с ?profile=1 и доля
+# PROFILE_SAMPLE_RATE всех запросов
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_SAMPLE_RATE = 0
+
+# Запросы дольше SLOW_QUERY_THRESHOLD_MS записываются вместе с планом
+# в SLOW_QUERY_LOG (по строке JSON на запрос); None отключает журнал.
+# Отчёт по журналу: manage.py slow_queries_report
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Обрабоотка ошибки 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
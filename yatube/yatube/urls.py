@@ -5,6 +5,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core import views as core_views
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -12,7 +14,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
-    path('__debug__/', include('debug_toolbar.urls')),
+    path('metrics/', core_views.metrics, name='metrics'),
 ]
 
 
@@ -24,4 +26,5 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
 